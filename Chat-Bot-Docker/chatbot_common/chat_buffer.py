@@ -0,0 +1,45 @@
+import json
+
+
+class ChatBuffer:
+    """Per-session chat buffer kept in a Redis list.
+
+    Each turn is stored as one packed JSON record, pushed together with a
+    sliding expiry in a single round trip, so sessions that never log out are
+    cleaned up by Redis. Readers walk the list in chunks instead of loading it
+    whole.
+    """
+
+    def __init__(self, redis_conn, ttl=3600, chunk_size=500):
+        self.redis_conn = redis_conn
+        self.ttl = ttl
+        self.chunk_size = chunk_size
+
+    def key(self, username, chat_id):
+        return f"chat:{username}:{chat_id}"
+
+    def append(self, username, chat_id, user_query, bot_response, pipe=None):
+        chat_key = self.key(username, chat_id)
+        record = json.dumps({"user_query": user_query, "bot_response": bot_response}, separators=(',', ':'))
+        own_pipe = pipe is None
+        if own_pipe:
+            pipe = self.redis_conn.pipeline(transaction=False)
+        pipe.rpush(chat_key, record)
+        pipe.expire(chat_key, self.ttl)
+        if own_pipe:
+            pipe.execute()
+
+    def iter_chunks(self, username, chat_id):
+        chat_key = self.key(username, chat_id)
+        start = 0
+        while True:
+            records = self.redis_conn.lrange(chat_key, start, start + self.chunk_size - 1)
+            if not records:
+                return
+            yield [json.loads(record) for record in records]
+            if len(records) < self.chunk_size:
+                return
+            start += self.chunk_size
+
+    def clear(self, username, chat_id):
+        return self.redis_conn.delete(self.key(username, chat_id))
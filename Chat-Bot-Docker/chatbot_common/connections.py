@@ -0,0 +1,175 @@
+import os
+import threading
+
+import redis
+from pymongo import MongoClient, monitoring
+
+# Defaults match the addresses Docker assigns on the default bridge network,
+# see "Troubleshooting" in the Readme. Everything can be overridden per
+# deployment through the environment.
+DEFAULT_MONGO_URI = 'mongodb://172.17.0.4:27017/'
+DEFAULT_REDIS_URL = 'redis://172.17.0.2:6379/0'
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def mongo_settings():
+    return {
+        "host": os.environ.get('MONGO_URI', DEFAULT_MONGO_URI),
+        "maxPoolSize": _env_int('MONGO_MAX_POOL_SIZE', 100),
+        "minPoolSize": _env_int('MONGO_MIN_POOL_SIZE', 0),
+        "maxIdleTimeMS": _env_int('MONGO_MAX_IDLE_TIME_MS', None),
+        "waitQueueTimeoutMS": _env_int('MONGO_WAIT_QUEUE_TIMEOUT_MS', None),
+        "connectTimeoutMS": _env_int('MONGO_CONNECT_TIMEOUT_MS', 5000),
+        "socketTimeoutMS": _env_int('MONGO_SOCKET_TIMEOUT_MS', None),
+        "serverSelectionTimeoutMS": _env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+    }
+
+
+def redis_settings():
+    return {
+        "url": os.environ.get('REDIS_URL', DEFAULT_REDIS_URL),
+        "max_connections": _env_int('REDIS_MAX_CONNECTIONS', 50),
+        "socket_timeout": _env_float('REDIS_SOCKET_TIMEOUT', 5.0),
+        "socket_connect_timeout": _env_float('REDIS_SOCKET_CONNECT_TIMEOUT', 5.0),
+        "health_check_interval": _env_int('REDIS_HEALTH_CHECK_INTERVAL', 30),
+    }
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Counts MongoDB pool events so utilisation can be reported."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.created = 0
+            self.closed = 0
+            self.checked_out = 0
+            self.checked_in = 0
+            self.checkout_failed = 0
+            self.pool_cleared = 0
+
+    def _incr(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "open_connections": self.created - self.closed,
+                "in_use": self.checked_out - self.checked_in,
+                "created": self.created,
+                "closed": self.closed,
+                "checkouts": self.checked_out,
+                "checkout_failures": self.checkout_failed,
+                "pool_cleared": self.pool_cleared,
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._incr('pool_cleared')
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._incr('created')
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._incr('closed')
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._incr('checkout_failed')
+
+    def connection_checked_out(self, event):
+        self._incr('checked_out')
+
+    def connection_checked_in(self, event):
+        self._incr('checked_in')
+
+
+_lock = threading.Lock()
+_mongo = {"pid": None, "client": None}
+_redis = {"pool": None}
+mongo_metrics = PoolMetrics()
+
+
+def get_mongo_client():
+    # MongoClient is not fork-safe. A client inherited from a preloading
+    # gunicorn master is dropped and the worker opens its own on first use.
+    pid = os.getpid()
+    if _mongo["pid"] != pid:
+        with _lock:
+            if _mongo["pid"] != pid:
+                mongo_metrics.reset()
+                settings = {k: v for k, v in mongo_settings().items() if v is not None}
+                _mongo["client"] = MongoClient(event_listeners=[mongo_metrics], **settings)
+                _mongo["pid"] = pid
+    return _mongo["client"]
+
+
+def get_redis_pool():
+    # redis-py pools check the pid on every checkout and discard connections
+    # inherited across a fork, so one pool per process image is enough
+    if _redis["pool"] is None:
+        with _lock:
+            if _redis["pool"] is None:
+                settings = redis_settings()
+                url = settings.pop("url")
+                _redis["pool"] = redis.ConnectionPool.from_url(url, decode_responses=True, **settings)
+    return _redis["pool"]
+
+
+def get_redis():
+    return redis.StrictRedis(connection_pool=get_redis_pool())
+
+
+class LazyCollection:
+    """Collection handle that resolves against the current process's client."""
+
+    def __init__(self, db_name, name):
+        self.db_name = db_name
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_mongo_client()[self.db_name][self.name], attr)
+
+
+def mongo_collection(db_name, name):
+    return LazyCollection(db_name, name)
+
+
+def pool_stats():
+    pool = get_redis_pool()
+    return {
+        "pid": os.getpid(),
+        "mongo": dict(mongo_metrics.snapshot(), max_pool_size=mongo_settings()["maxPoolSize"]),
+        "redis": {
+            "created_connections": pool._created_connections,
+            "available": len(pool._available_connections),
+            "in_use": len(pool._in_use_connections),
+            "max_connections": pool.max_connections,
+        },
+    }
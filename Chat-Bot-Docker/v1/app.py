@@ -1,20 +1,27 @@
 from flask import Flask, request, jsonify, redirect, url_for, session
-from pymongo import MongoClient
-import redis
 import uuid
 import secrets
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from chatbot_common.chat_buffer import ChatBuffer
+from chatbot_common.connections import get_redis, mongo_collection, pool_stats
 
 app = Flask(__name__)
-app.secret_key = secrets.token_hex(32)  # Generate a secure secret key
+# Every worker must share the key or sessions break across workers; the
+# random fallback is only suitable for a single process
+app.secret_key = os.environ.get('FLASK_SECRET_KEY') or secrets.token_hex(32)
+
+# MongoDB setup (MONGO_URI and pool settings come from the environment)
+users_collection = mongo_collection('ikea_chatbot_db', 'users')
+chat_collection = mongo_collection('ikea_chatbot_db', 'chat')  # New collection for storing chat history separately
 
-# MongoDB setup
-client = MongoClient('mongodb://172.17.0.4:27017/')
-db = client['ikea_chatbot_db']
-users_collection = db['users']
-chat_collection = db['chat']  # New collection for storing chat history separately
+# Redis setup (REDIS_URL and pool settings come from the environment)
+r = get_redis()
 
-# Redis setup
-r = redis.StrictRedis(host='172.17.0.2', port=6379, db=0, decode_responses=True)
+# Session chat turns, one packed record per turn with a sliding one hour TTL
+chat_buffer = ChatBuffer(r, ttl=3600, chunk_size=500)
 
 # Predefined FAQ responses
 faq_responses = {
@@ -73,7 +80,7 @@ def login(username, password):
     session['chat_id'] = str(uuid.uuid4())
     
     # Initialize chat history in Redis
-    r.delete(f"chat:{username}:{session['chat_id']}")  # Ensure no leftover data
+    chat_buffer.clear(username, session['chat_id'])  # Ensure no leftover data
 
     return redirect(url_for('chat'))
 
@@ -95,10 +102,8 @@ def chat():
         # Handle other queries
         response = handle_query(user_query, username, chat_id)
         
-        # Store both user query and bot response in Redis as a list
-        chat_key = f"chat:{username}:{chat_id}"
-        r.rpush(chat_key, f"user_message:{user_query}")
-        r.rpush(chat_key, f"response:{response}")
+        # Store the user query and bot response in Redis as one record
+        chat_buffer.append(username, chat_id, user_query, response)
 
         return jsonify({"response": response}), 200
 
@@ -130,17 +135,14 @@ def logout():
     chat_id = session['chat_id']
     
     # Retrieve and save chat history to MongoDB
-    chat_key = f"chat:{username}:{chat_id}"
-    chat_history = r.lrange(chat_key, 0, -1)
-
-    if chat_history:
-        # Prepare chat history in the required format (ordered)
-        chat_history_dict = {}
-        for i in range(0, len(chat_history), 2):
-            user_message = chat_history[i].replace("user_message:", "")
-            response = chat_history[i+1].replace("response:", "")
-            chat_history_dict[user_message] = response
-
+    # Prepare chat history in the required format (ordered), reading the
+    # Redis list in chunks
+    chat_history_dict = {}
+    for turns in chat_buffer.iter_chunks(username, chat_id):
+        for turn in turns:
+            chat_history_dict[turn["user_query"]] = turn["bot_response"]
+
+    if chat_history_dict:
         # Check if the username exists in the chat collection
         existing_chat = chat_collection.find_one({"username": username})
 
@@ -158,11 +160,15 @@ def logout():
             })
 
     # Clean up Redis and session
-    r.delete(chat_key)
+    chat_buffer.clear(username, chat_id)
     session.pop('username', None)
     session.pop('chat_id', None)
 
     return jsonify({"message": "You have been logged out successfully."}), 200
 
+@app.route('/pool_stats', methods=['GET'])
+def connection_pool_stats():
+    return jsonify(pool_stats()), 200
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5002,  debug=True)
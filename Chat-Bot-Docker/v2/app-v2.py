@@ -1,21 +1,41 @@
 from flask import Flask, request, jsonify, redirect, url_for, session
-from pymongo import MongoClient
-import redis
 import uuid
 import secrets
 import re
+import atexit
+import os
+import sys
 from datetime import datetime
 from bson import ObjectId
+from faq_matcher import FaqMatcher
+from chat_writer import ChatWriteBehind
+from keyword_stats import KeywordStats
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from chatbot_common.chat_buffer import ChatBuffer
+from chatbot_common.connections import get_redis, mongo_collection, pool_stats
 
 app = Flask(__name__)
-app.secret_key = secrets.token_hex(32)  
+# Every worker must share the key or sessions break across workers; the
+# random fallback is only suitable for a single process
+app.secret_key = os.environ.get('FLASK_SECRET_KEY') or secrets.token_hex(32)
+
+users_collection = mongo_collection('ikea_chatbot_db', 'users')
+chat_collection = mongo_collection('ikea_chatbot_db', 'chat')
+keyword_stats_collection = mongo_collection('ikea_chatbot_db', 'keyword_stats')
+
+r = get_redis()
 
-client = MongoClient('mongodb://172.17.0.4:27017/')
-db = client['ikea_chatbot_db']
-users_collection = db['users']
-chat_collection = db['chat'] 
+# Session chat turns, one packed record per turn with a sliding one hour TTL
+chat_buffer = ChatBuffer(r, ttl=3600, chunk_size=500)
 
-r = redis.StrictRedis(host='172.17.0.2', port=6379, db=0, decode_responses=True)
+# Chat turns are buffered in Redis and flushed to MongoDB in batches
+chat_writer = ChatWriteBehind(r, chat_collection, batch_size=500, flush_interval=1.0)
+atexit.register(chat_writer.stop)
+
+# Keyword counters are kept up to date on every matched query
+keyword_stats = KeywordStats(r, keyword_stats_collection)
+atexit.register(keyword_stats.stop)
 
 faq_responses = {
     "store hours": "Our store hours are from 9 AM to 9 PM.",
@@ -30,6 +50,10 @@ faq_responses = {
     "warranty policy": "We offer a 10-year warranty on many of our products."
 }
 
+# Built once at startup; call faq_matcher.rebuild() after editing faq_responses
+faq_matcher = FaqMatcher(faq_responses)
+greeting_pattern = re.compile(r'\b(hi|hello|hey)\b', re.IGNORECASE)
+
 @app.route('/')
 def index():
     routes = {
@@ -73,7 +97,7 @@ def login(username, password):
     session['username'] = username
     session['chat_id'] = str(uuid.uuid4())
 
-    r.delete(f"chat:{username}:{session['chat_id']}") 
+    chat_buffer.clear(username, session['chat_id'])
 
     return redirect(url_for('chat'))
 
@@ -91,11 +115,11 @@ def chat():
         if user_query == "logout":
             return redirect(url_for('logout'))
 
-        response = handle_query(user_query, username)
+        pipe = r.pipeline(transaction=False)
+        response = handle_query(user_query, username, pipe)
 
-        chat_key = f"chat:{username}:{chat_id}"
-        r.rpush(chat_key, f"user_message:{user_query}")
-        r.rpush(chat_key, f"response:{response}")
+        chat_buffer.append(username, chat_id, user_query, response, pipe)
+        pipe.execute()
 
         return jsonify({"response": response}), 200
     
@@ -106,43 +130,26 @@ def chat():
     }
     return jsonify({"message": welcome_message, "insights": insights}), 200
 
-def handle_query(query, username):
-    if re.search(r'\b(hi|hello|hey)\b', query, re.IGNORECASE):
+def handle_query(query, username, pipe=None):
+    if greeting_pattern.search(query):
         return f"Hello, {username}! How can I assist you today?"
 
-    responses = []
-    matched_keywords = []
+    matches = faq_matcher.match(query)
+    matched_keywords = [keyword for keyword, _ in matches]
+    responses = [answer for _, answer in matches]
     date_key = datetime.now().strftime('%Y-%m-%d')
 
-    for keyword, answer in faq_responses.items():
-        if re.search(rf"\b{keyword}\b", query, re.IGNORECASE):
-            responses.append(answer)
-            matched_keywords.append(keyword)
-
     if responses:
-        update_chat_history_and_queries(username, matched_keywords, query, " ".join(responses), date_key)
+        update_chat_history_and_queries(username, matched_keywords, query, " ".join(responses), date_key, pipe)
         return " ".join(responses)
     
     return "I'm not sure how to help with that. Please ask something else or type 'logout' to end the session."
 
-def update_chat_history_and_queries(username, matched_keywords, user_query, bot_response, date_key):
-    user_doc = chat_collection.find_one({"username": username})
-    
-    chat_collection.update_one(
-        {"username": username},
-        {"$push": {f"chathistory.{date_key}": {"user_query": user_query, "bot_response": bot_response}}},
-        upsert=True
-    )
-
-    existing_keywords = user_doc.get("user_queries", {}).get(date_key, []) if user_doc else []
-    new_keywords = list(set(matched_keywords) - set(existing_keywords))
-    
-    if new_keywords:
-        chat_collection.update_one(
-            {"username": username},
-            {"$push": {f"user_queries.{date_key}": {"$each": new_keywords}}},
-            upsert=True
-        )
+def update_chat_history_and_queries(username, matched_keywords, user_query, bot_response, date_key, pipe=None):
+    # Queued in the caller's Redis pipeline; the write-behind worker applies it
+    # to the chat collection with $push / $addToSet in a grouped bulk_write
+    chat_writer.enqueue(username, date_key, user_query, bot_response, matched_keywords, pipe)
+    keyword_stats.record(username, date_key, matched_keywords, pipe)
 
 @app.route('/logout', methods=['POST', 'GET'])
 def logout():
@@ -152,33 +159,20 @@ def logout():
     username = session['username']
     chat_id = session['chat_id']
     
-    chat_key = f"chat:{username}:{chat_id}"
-    chat_history = r.lrange(chat_key, 0, -1)
-
-    if chat_history:
-        chat_history_list = []
-        for i in range(0, len(chat_history), 2):
-            user_message = chat_history[i].replace("user_message:", "")
-            response = chat_history[i+1].replace("response:", "")
-            chat_history_list.append({"user_query": user_message, "bot_response": response})
-
-        date_key = datetime.now().strftime('%Y-%m-%d')
-
-        existing_chat = chat_collection.find_one({"username": username, f"chathistory.{date_key}": {"$exists": True}})
-
-        if existing_chat:
-            chat_collection.update_one(
-                {"username": username, f"chathistory.{date_key}": {"$exists": True}},
-                {"$push": {f"chathistory.{date_key}": {"$each": chat_history_list}}}
-            )
-        else:
-            chat_collection.update_one(
-                {"username": username},
-                {"$set": {f"chathistory.{date_key}": chat_history_list}},
-                upsert=True
-            )
-
-    r.delete(chat_key)
+    chat_writer.flush()
+
+    date_key = datetime.now().strftime('%Y-%m-%d')
+
+    # $push creates the day's array when it does not exist yet, so each chunk
+    # is appended with a single upsert
+    for chat_history_list in chat_buffer.iter_chunks(username, chat_id):
+        chat_collection.update_one(
+            {"username": username},
+            {"$push": {f"chathistory.{date_key}": {"$each": chat_history_list}}},
+            upsert=True
+        )
+
+    chat_buffer.clear(username, chat_id)
     session.pop('username', None)
     session.pop('chat_id', None)
 
@@ -186,17 +180,34 @@ def logout():
 
 @app.route('/statistics', methods=['GET'])
 def statistics():
-    keyword_stats = {}
-
-    for user_doc in chat_collection.find({}):
-        for date, keywords in user_doc.get("user_queries", {}).items():
-            for keyword in keywords:
-                if keyword not in keyword_stats:
-                    keyword_stats[keyword] = 0
-                keyword_stats[keyword] += 1
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    top = request.args.get('top')
 
-    stats_list = [{"keyword": k, "count": v} for k, v in keyword_stats.items()]
+    try:
+        for date_value in (date_from, date_to):
+            if date_value:
+                datetime.strptime(date_value, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({"error": "Invalid date format. Use YYYY-MM-DD."}), 400
+
+    if top is not None:
+        if not top.isdigit() or int(top) < 1:
+            return jsonify({"error": "top must be a positive integer."}), 400
+        top = int(top)
+
+    rows = keyword_stats.top(date_from, date_to, top)
+    stats_list = [{"keyword": k, "count": v} for k, v in rows]
     return jsonify({"statistics": stats_list}), 200
 
+@app.route('/pool_stats', methods=['GET'])
+def connection_pool_stats():
+    return jsonify(pool_stats()), 200
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats():
+    rows = keyword_stats.rebuild(chat_collection)
+    print(f"Rebuilt keyword statistics from chat history ({rows} date/keyword counters).")
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5002, debug=True)
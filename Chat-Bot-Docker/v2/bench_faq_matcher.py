@@ -0,0 +1,75 @@
+import random
+import re
+import string
+import time
+
+from faq_matcher import FaqMatcher
+
+FAQ_SIZES = [10, 1000, 10000]
+QUERIES = [
+    "what are your store hours on sunday",
+    "do you offer home delivery and what is the refund policy",
+    "i want to track order 12345 and modify order address",
+    "hello there",
+    "can i pay with paypal, what payment methods do you accept",
+]
+
+
+def random_word(rng):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+
+
+def build_faq(size, seed=42):
+    rng = random.Random(seed)
+    faq = {
+        "store hours": "Our store hours are from 9 AM to 9 PM.",
+        "home delivery": "Yes, we offer home delivery for all our products.",
+        "refund policy": "Refunds are processed within 7-10 business days.",
+        "track order": "You can track your order using the tracking number provided in your email.",
+        "modify order": "Orders can be modified within 24 hours of placement.",
+        "payment methods": "We accept all major credit cards, PayPal, and IKEA gift cards.",
+    }
+    while len(faq) < size:
+        faq[f"{random_word(rng)} {random_word(rng)}"] = "Generated answer."
+    return dict(list(faq.items())[:size])
+
+
+def old_loop(faq_responses, query):
+    matches = []
+    for keyword, answer in faq_responses.items():
+        if re.search(rf"\b{keyword}\b", query, re.IGNORECASE):
+            matches.append((keyword, answer))
+    return matches
+
+
+def time_per_query(func, budget_seconds=1.0, max_rounds=2000):
+    rounds = 0
+    start = time.perf_counter()
+    while rounds < max_rounds:
+        for query in QUERIES:
+            func(query)
+        rounds += 1
+        if time.perf_counter() - start > budget_seconds:
+            break
+    return (time.perf_counter() - start) / (rounds * len(QUERIES))
+
+
+def main():
+    print(f"{'FAQ size':>10} {'old loop (us)':>15} {'matcher (us)':>15} {'build (ms)':>12} {'speedup':>9}")
+    for size in FAQ_SIZES:
+        faq = build_faq(size)
+
+        start = time.perf_counter()
+        matcher = FaqMatcher(faq)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        for query in QUERIES:
+            assert matcher.match(query) == old_loop(faq, query)
+
+        old = time_per_query(lambda q: old_loop(faq, q))
+        new = time_per_query(matcher.match)
+        print(f"{size:>10} {old * 1e6:>15.1f} {new * 1e6:>15.1f} {build_ms:>12.1f} {old / new:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
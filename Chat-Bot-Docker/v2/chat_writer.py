@@ -0,0 +1,180 @@
+import json
+import os
+import threading
+import uuid
+
+from pymongo import UpdateOne
+
+# Moves up to ARGV[1] turns from the head of the queue to this writer's
+# processing list, so they stay in Redis until they are written. Turns still
+# in the processing list from a flush that failed are returned first.
+# KEYS: queue, processing list
+TAKE_SCRIPT = """
+local pending = redis.call('LRANGE', KEYS[2], 0, -1)
+if #pending > 0 then
+    return pending
+end
+local records = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #records > 0 then
+    redis.call('LTRIM', KEYS[1], #records, -1)
+    redis.call('RPUSH', KEYS[2], unpack(records))
+end
+return records
+"""
+
+
+class ChatWriteBehind:
+    """Write-behind buffer for chat turns.
+
+    Turns are appended to a Redis list (usually inside the request's own
+    pipeline) and a background thread moves them to MongoDB in grouped
+    bulk_write calls once `batch_size` turns are pending or `flush_interval`
+    seconds have passed. Keeping the buffer in Redis means every worker process
+    shares it and nothing is lost if a worker dies before flushing.
+
+    A batch is moved to a processing list of its own per process while it is
+    written, and only removed once MongoDB has it. The process keeps a lease
+    on that list; a writer starting up puts the turns of any list whose lease
+    ran out (its process died mid-flush) back at the head of the queue. A
+    turn may then be written twice if the process died after the write.
+    """
+
+    def __init__(self, redis_conn, collection, key='chat:write_behind', batch_size=500, flush_interval=1.0):
+        self.redis_conn = redis_conn
+        self.collection = collection
+        self.key = key
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Seconds a processing list is kept for a process that stopped renewing it
+        self.lease = max(30, 10 * flush_interval)
+        self._take_script = redis_conn.register_script(TAKE_SCRIPT)
+        self._processing = None
+        self._processing_pid = None
+        self._pending = 0
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def enqueue(self, username, date_key, user_query, bot_response, keywords, pipe=None):
+        record = json.dumps({
+            "username": username,
+            "date": date_key,
+            "user_query": user_query,
+            "bot_response": bot_response,
+            "keywords": keywords,
+        })
+        (pipe if pipe is not None else self.redis_conn).rpush(self.key, record)
+        self._ensure_started()
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self._wakeup.set()
+
+    @property
+    def processing_set(self):
+        return f"{self.key}:processing"
+
+    def _ensure_processing(self):
+        # One processing list per process, registered so another process can
+        # recover it
+        if self._processing_pid == os.getpid():
+            return
+        self._processing_pid = os.getpid()
+        self._processing = f"{self.processing_set}:{uuid.uuid4().hex}"
+        self._renew_lease()
+        self.redis_conn.sadd(self.processing_set, self._processing)
+        self.recover()
+
+    def _renew_lease(self):
+        self.redis_conn.set(f"{self._processing}:lease", os.getpid(), ex=int(self.lease))
+
+    def recover(self):
+        """Requeue the turns of processing lists whose process is gone."""
+        recovered = 0
+        for processing in self.redis_conn.smembers(self.processing_set):
+            if processing == self._processing or self.redis_conn.exists(f"{processing}:lease"):
+                continue
+            # Tail to head keeps the turns in their original order
+            while self.redis_conn.rpoplpush(processing, self.key) is not None:
+                recovered += 1
+            self.redis_conn.srem(self.processing_set, processing)
+        if recovered:
+            print(f"Chat write-behind recovered {recovered} unwritten turns")
+        return recovered
+
+    def _ensure_started(self):
+        # Threads do not survive a fork, so a worker forked from a preloaded
+        # master starts its own flusher on first use
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._ensure_processing()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='chat-write-behind', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Chat write-behind flush failed: {e}")
+
+    def _take(self, count):
+        self._renew_lease()
+        records = self._take_script(keys=[self.key, self._processing], args=[count])
+        return [json.loads(record) for record in records]
+
+    def _requeue(self):
+        while self.redis_conn.rpoplpush(self._processing, self.key) is not None:
+            pass
+
+    def _write(self, records):
+        grouped = {}
+        for record in records:
+            update = grouped.setdefault(record["username"], {"$push": {}, "$addToSet": {}})
+            turns = update["$push"].setdefault(f"chathistory.{record['date']}", {"$each": []})
+            turns["$each"].append({"user_query": record["user_query"], "bot_response": record["bot_response"]})
+            if record["keywords"]:
+                keywords = update["$addToSet"].setdefault(f"user_queries.{record['date']}", {"$each": []})
+                for keyword in record["keywords"]:
+                    if keyword not in keywords["$each"]:
+                        keywords["$each"].append(keyword)
+
+        operations = []
+        for username, update in grouped.items():
+            update = {operator: fields for operator, fields in update.items() if fields}
+            operations.append(UpdateOne({"username": username}, update, upsert=True))
+        self.collection.bulk_write(operations, ordered=False)
+
+    def flush(self):
+        written = 0
+        with self._flush_lock:
+            self._ensure_processing()
+            self._pending = 0
+            while True:
+                records = self._take(self.batch_size)
+                if not records:
+                    return written
+                try:
+                    self._write(records)
+                except Exception:
+                    # Put the batch back at the head of the list so it is retried
+                    self._requeue()
+                    raise
+                self.redis_conn.delete(self._processing)
+                written += len(records)
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval + 5)
+        written = self.flush()
+        if self._processing_pid == os.getpid():
+            self.redis_conn.srem(self.processing_set, self._processing)
+            self.redis_conn.delete(f"{self._processing}:lease")
+        return written
@@ -0,0 +1,94 @@
+import threading
+from collections import deque
+
+
+def _is_word(ch):
+    return ch.isalnum() or ch == '_'
+
+
+def _at_boundary(text, pos):
+    # Same rule as the regex \b: a word character on exactly one side of pos
+    before = pos > 0 and _is_word(text[pos - 1])
+    after = pos < len(text) and _is_word(text[pos])
+    return before != after
+
+
+class FaqMatcher:
+    """Aho-Corasick automaton over the FAQ keywords.
+
+    The automaton is built once and a query is matched in a single pass, so the
+    cost per message depends on the length of the query and not on the number
+    of FAQ entries. Call rebuild() (or use update()/remove()) whenever the FAQ
+    table changes.
+    """
+
+    def __init__(self, faq_responses):
+        self.faq_responses = faq_responses
+        self._lock = threading.Lock()
+        self._automaton = None
+        self.rebuild()
+
+    def rebuild(self):
+        entries = [(keyword, answer) for keyword, answer in self.faq_responses.items() if keyword]
+        goto = [{}]
+        fail = [0]
+        out = [[]]
+
+        for index, (keyword, _) in enumerate(entries):
+            state = 0
+            for ch in keyword.lower():
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][ch] = next_state
+                    goto.append({})
+                    fail.append(0)
+                    out.append([])
+                state = next_state
+            out[state].append((index, len(keyword.lower())))
+
+        # Children of the root fail back to the root; everything deeper is
+        # resolved breadth-first from its parent's failure link
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and ch not in goto[fallback]:
+                    fallback = fail[fallback]
+                if state:
+                    fail[next_state] = goto[fallback].get(ch, 0)
+                out[next_state] = out[next_state] + out[fail[next_state]]
+
+        # Swap in the new automaton in one assignment so concurrent match() calls
+        # always see a consistent snapshot
+        with self._lock:
+            self._automaton = (entries, goto, fail, out)
+
+    def update(self, mapping):
+        self.faq_responses.update(mapping)
+        self.rebuild()
+
+    def remove(self, keyword):
+        self.faq_responses.pop(keyword, None)
+        self.rebuild()
+
+    def match(self, query):
+        entries, goto, fail, out = self._automaton
+        text = query.lower()
+        state = 0
+        found = set()
+
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index, length in out[state]:
+                if index in found:
+                    continue
+                if _at_boundary(text, i - length + 1) and _at_boundary(text, i + 1):
+                    found.add(index)
+
+        # Keep the FAQ table order so responses read the same as before
+        return [entries[index] for index in sorted(found)]
@@ -0,0 +1,175 @@
+import os
+import threading
+from datetime import datetime
+
+from pymongo import ASCENDING, UpdateOne
+
+# Counts a keyword once per user per day, matching what the chat collection
+# stores under user_queries.<date>.
+# KEYS: seen set, day hash, totals zset, days zset, dirty days set
+# ARGV: date, date score, seen ttl, keywords...
+RECORD_SCRIPT = """
+local added = 0
+for i = 4, #ARGV do
+    if redis.call('SADD', KEYS[1], ARGV[i]) == 1 then
+        redis.call('HINCRBY', KEYS[2], ARGV[i], 1)
+        redis.call('ZINCRBY', KEYS[3], 1, ARGV[i])
+        added = added + 1
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+if added > 0 then
+    redis.call('ZADD', KEYS[4], ARGV[2], ARGV[1])
+    redis.call('SADD', KEYS[5], ARGV[1])
+end
+return added
+"""
+
+REBUILD_PIPELINE = [
+    {"$project": {"username": 1, "days": {"$objectToArray": {"$ifNull": ["$user_queries", {}]}}}},
+    {"$unwind": "$days"},
+    {"$unwind": "$days.v"},
+    {"$group": {"_id": {"date": "$days.k", "keyword": "$days.v"}, "count": {"$sum": 1}}},
+    {"$project": {"_id": 0, "date": "$_id.date", "keyword": "$_id.keyword", "count": 1}},
+]
+
+
+def date_score(date_key):
+    return int(date_key.replace('-', ''))
+
+
+class KeywordStats:
+    """FAQ keyword counters maintained at write time.
+
+    Redis keeps one hash of keyword counts per day plus a sorted set of
+    all-time totals, so /statistics only reads as many entries as there are
+    keywords (times the number of days when a date range is given). Touched
+    days are periodically copied to the `stats_collection` aggregate in Mongo,
+    and rebuild() backfills both stores from the chat history.
+    """
+
+    def __init__(self, redis_conn, stats_collection, prefix='stats', reconcile_interval=60, seen_ttl=2 * 24 * 3600):
+        self.redis_conn = redis_conn
+        self.stats_collection = stats_collection
+        self.prefix = prefix
+        self.reconcile_interval = reconcile_interval
+        self.seen_ttl = seen_ttl
+        self.totals_key = f"{prefix}:totals"
+        self.days_key = f"{prefix}:days"
+        self.dirty_key = f"{prefix}:dirty_days"
+        self._record_script = redis_conn.register_script(RECORD_SCRIPT)
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def day_key(self, date_key):
+        return f"{self.prefix}:day:{date_key}"
+
+    def seen_key(self, date_key, username):
+        return f"{self.prefix}:seen:{date_key}:{username}"
+
+    def record(self, username, date_key, keywords, pipe=None):
+        if not keywords:
+            return
+        keys = [self.seen_key(date_key, username), self.day_key(date_key), self.totals_key, self.days_key, self.dirty_key]
+        args = [date_key, date_score(date_key), self.seen_ttl, *keywords]
+        self._record_script(keys=keys, args=args, client=pipe if pipe is not None else self.redis_conn)
+        self._ensure_started()
+
+    def top(self, date_from=None, date_to=None, limit=None):
+        if date_from is None and date_to is None:
+            end = -1 if limit is None else limit - 1
+            rows = self.redis_conn.zrevrange(self.totals_key, 0, end, withscores=True)
+            return [(keyword, int(count)) for keyword, count in rows]
+
+        low = date_score(date_from) if date_from else '-inf'
+        high = date_score(date_to) if date_to else '+inf'
+        days = self.redis_conn.zrangebyscore(self.days_key, low, high)
+
+        pipe = self.redis_conn.pipeline(transaction=False)
+        for day in days:
+            pipe.hgetall(self.day_key(day))
+        totals = {}
+        for counts in pipe.execute():
+            for keyword, count in counts.items():
+                totals[keyword] = totals.get(keyword, 0) + int(count)
+
+        rows = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+        return rows if limit is None else rows[:limit]
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='keyword-stats-reconcile', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.reconcile_interval):
+            try:
+                self.reconcile()
+            except Exception as e:
+                print(f"Keyword statistics reconcile failed: {e}")
+
+    def reconcile(self):
+        pipe = self.redis_conn.pipeline(transaction=True)
+        pipe.smembers(self.dirty_key)
+        pipe.delete(self.dirty_key)
+        days, _ = pipe.execute()
+        if not days:
+            return 0
+
+        days = sorted(days)
+        pipe = self.redis_conn.pipeline(transaction=False)
+        for day in days:
+            pipe.hgetall(self.day_key(day))
+
+        operations = []
+        for day, counts in zip(days, pipe.execute()):
+            for keyword, count in counts.items():
+                operations.append(UpdateOne(
+                    {"date": day, "keyword": keyword},
+                    {"$set": {"count": int(count)}},
+                    upsert=True
+                ))
+        if operations:
+            try:
+                self.stats_collection.bulk_write(operations, ordered=False)
+            except Exception:
+                self.redis_conn.sadd(self.dirty_key, *days)
+                raise
+        return len(operations)
+
+    def stop(self):
+        self._stopped.set()
+        return self.reconcile()
+
+    def rebuild(self, chat_collection):
+        self.stats_collection.create_index([("date", ASCENDING), ("keyword", ASCENDING)], unique=True)
+        rows = list(chat_collection.aggregate(REBUILD_PIPELINE, allowDiskUse=True))
+
+        self.stats_collection.delete_many({})
+        if rows:
+            self.stats_collection.insert_many([dict(row) for row in rows], ordered=False)
+
+        stale = [self.totals_key, self.days_key, self.dirty_key]
+        stale += [self.day_key(day) for day in self.redis_conn.zrange(self.days_key, 0, -1)]
+        pipe = self.redis_conn.pipeline(transaction=True)
+        pipe.delete(*stale)
+        for row in rows:
+            pipe.hincrby(self.day_key(row["date"]), row["keyword"], row["count"])
+            pipe.zincrby(self.totals_key, row["count"], row["keyword"])
+            pipe.zadd(self.days_key, {row["date"]: date_score(row["date"])})
+
+        # Today's per-user seen sets keep the counters from double counting
+        # keywords users already asked about before the rebuild
+        today = datetime.now().strftime('%Y-%m-%d')
+        for doc in chat_collection.find({f"user_queries.{today}": {"$exists": True}}, {"username": 1, f"user_queries.{today}": 1}):
+            keywords = doc["user_queries"][today]
+            if keywords:
+                seen_key = self.seen_key(today, doc["username"])
+                pipe.sadd(seen_key, *keywords)
+                pipe.expire(seen_key, self.seen_ttl)
+        pipe.execute()
+        return len(rows)
@@ -0,0 +1,271 @@
+import math
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+# (lower bound inclusive, upper bound exclusive, label)
+AGE_BUCKETS = [
+    (0, 12, '0-11'),
+    (12, 18, '12-17'),
+    (18, 30, '18-29'),
+    (30, 45, '30-44'),
+    (45, 60, '45-59'),
+    (60, None, '60+'),
+]
+UNKNOWN_AGE = 'unknown'
+AGE_BOUNDARIES = {low for low, _, _ in AGE_BUCKETS} | {high for _, high, _ in AGE_BUCKETS if high is not None}
+
+DIMENSIONS = ['Sex', 'Pclass', 'Embarked', 'AgeBucket']
+EQUALITY_FILTERS = ['Sex', 'Pclass', 'Embarked', 'Survived']
+RANGE_FILTERS = ['age_min', 'age_max']
+
+META_ID = '_meta'
+LOCK_ID = 'summary'
+# A writer holding its share of the rebuild lock for longer than this is
+# assumed to have died with it
+WRITER_LEASE = 60
+# Seconds a writer waits for a rebuild, or a rebuild for writers, before giving up
+LOCK_WAIT = 300
+
+
+def _age_bucket_expression():
+    branches = []
+    for low, high, label in AGE_BUCKETS:
+        conditions = [{'$isNumber': '$Age'}, {'$gte': ['$Age', low]}]
+        if high is not None:
+            conditions.append({'$lt': ['$Age', high]})
+        branches.append({'case': {'$and': conditions}, 'then': label})
+    return {'$switch': {'branches': branches, 'default': UNKNOWN_AGE}}
+
+
+def _dimension_expression(dimension):
+    if dimension == 'AgeBucket':
+        return _age_bucket_expression()
+    return {'$ifNull': [f'${dimension}', None]}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and not math.isnan(value)
+
+
+def age_bucket(age):
+    # Must agree with _age_bucket_expression()
+    if not _is_number(age):
+        return UNKNOWN_AGE
+    for low, high, label in AGE_BUCKETS:
+        if age >= low and (high is None or age < high):
+            return label
+    return UNKNOWN_AGE
+
+
+def _survived(doc):
+    value = doc.get('Survived')
+    return 1 if _is_number(value) and value == 1 else 0
+
+
+def cell_id(doc):
+    return {
+        'Sex': doc.get('Sex'),
+        'Pclass': doc.get('Pclass'),
+        'Embarked': doc.get('Embarked'),
+        'AgeBucket': age_bucket(doc.get('Age')),
+    }
+
+
+def pipeline_match(filters):
+    """The passengers $match used when a query cannot be served from the summary."""
+    match = {name: filters[name] for name in EQUALITY_FILTERS if name in filters}
+    age_range = {}
+    if 'age_min' in filters:
+        age_range['$gte'] = filters['age_min']
+    if 'age_max' in filters:
+        age_range['$lt'] = filters['age_max']
+    if age_range:
+        match['Age'] = age_range
+    return match
+
+
+def validate_query(group_by, filters):
+    unknown = [dimension for dimension in group_by if dimension not in DIMENSIONS]
+    if unknown:
+        return f"Unknown group_by dimension(s): {', '.join(unknown)}. Allowed: {', '.join(DIMENSIONS)}"
+    unknown = [name for name in filters if name not in EQUALITY_FILTERS + RANGE_FILTERS]
+    if unknown:
+        return f"Unknown filter(s): {', '.join(unknown)}. Allowed: {', '.join(EQUALITY_FILTERS + RANGE_FILTERS)}"
+    for name in RANGE_FILTERS:
+        if name in filters and not _is_number(filters[name]):
+            return f"{name} must be a number"
+    return None
+
+
+class SurvivalAnalytics:
+    """Survival counts grouped by passenger dimensions.
+
+    `summary_collection` holds one document per Sex/Pclass/Embarked/age bucket
+    cell with its passenger and survivor counts. Inserts and updates adjust the
+    affected cells with $inc, so any query whose filters line up with those
+    cells is answered by rolling up a few hundred small documents instead of
+    scanning passengers. Other queries run as a single aggregation pipeline.
+
+    Changes to passengers and the matching apply()/move() go inside
+    writing(). rebuild() waits for those to finish and holds new ones off
+    until it is done, so no $inc is lost when $out replaces the summary.
+    """
+
+    def __init__(self, passengers, summary_collection):
+        self.passengers = passengers
+        self.summary_collection = summary_collection
+        # Kept outside the summary collection, which $out replaces
+        self.lock_collection = summary_collection.database[f'{summary_collection.name}_lock']
+
+    def _wait(self, deadline, message):
+        if time.monotonic() > deadline:
+            raise RuntimeError(message)
+        time.sleep(0.5)
+
+    @contextmanager
+    def writing(self):
+        """Hold while changing passengers and applying the change to the summary."""
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + LOCK_WAIT
+        while True:
+            try:
+                # Collides with the lock document while a rebuild holds it
+                self.lock_collection.update_one({'_id': LOCK_ID, 'rebuilding': {'$ne': True}},
+                                                {'$set': {f'writers.{token}': datetime.utcnow()}}, upsert=True)
+                break
+            except DuplicateKeyError:
+                self._wait(deadline, "The passenger summary is being rebuilt, try again later")
+        try:
+            yield
+        finally:
+            self.lock_collection.update_one({'_id': LOCK_ID}, {'$unset': {f'writers.{token}': ''}})
+
+    def apply(self, docs, sign=1):
+        cells = defaultdict(lambda: [0, 0])
+        for doc in docs:
+            key = cell_id(doc)
+            cell = cells[tuple(key.items())]
+            cell[0] += sign
+            cell[1] += sign * _survived(doc)
+
+        operations = [
+            UpdateOne({'_id': dict(key)}, {'$inc': {'count': count, 'survived': survived}}, upsert=True)
+            for key, (count, survived) in cells.items() if count or survived
+        ]
+        if operations:
+            self.summary_collection.bulk_write(operations, ordered=False)
+
+    def move(self, old_doc, new_doc):
+        if cell_id(old_doc) == cell_id(new_doc) and _survived(old_doc) == _survived(new_doc):
+            return
+        self.apply([old_doc], sign=-1)
+        self.apply([new_doc])
+
+    def rebuild(self):
+        try:
+            self.lock_collection.update_one({'_id': LOCK_ID, 'rebuilding': {'$ne': True}},
+                                            {'$set': {'rebuilding': True}}, upsert=True)
+        except DuplicateKeyError:
+            raise RuntimeError("Another rebuild of the passenger summary is running") from None
+        try:
+            deadline = time.monotonic() + LOCK_WAIT
+            while True:
+                lock = self.lock_collection.find_one({'_id': LOCK_ID}) or {}
+                cutoff = datetime.utcnow() - timedelta(seconds=WRITER_LEASE)
+                if not any(started > cutoff for started in lock.get('writers', {}).values()):
+                    break
+                self._wait(deadline, "Timed out waiting for passenger writes to finish")
+            return self._rebuild()
+        finally:
+            # Writers that outlived their lease are dropped along with the flag
+            self.lock_collection.update_one({'_id': LOCK_ID}, {'$set': {'rebuilding': False, 'writers': {}}})
+
+    def _rebuild(self):
+        pipeline = [
+            {'$group': {
+                '_id': {dimension: _dimension_expression(dimension) for dimension in DIMENSIONS},
+                'count': {'$sum': 1},
+                'survived': {'$sum': {'$cond': [{'$eq': ['$Survived', 1]}, 1, 0]}},
+            }},
+            {'$out': self.summary_collection.name},
+        ]
+        self.passengers.aggregate(pipeline, allowDiskUse=True)
+        self.summary_collection.replace_one(
+            {'_id': META_ID},
+            {'_id': META_ID, 'ready': True, 'rebuilt_at': datetime.utcnow()},
+            upsert=True
+        )
+        return self.summary_collection.count_documents({'count': {'$exists': True}})
+
+    def summary_ready(self):
+        meta = self.summary_collection.find_one({'_id': META_ID})
+        return bool(meta and meta.get('ready'))
+
+    def _summary_supports(self, filters):
+        # The summary only counts survivors (Survived == 1). Survived=0 is not
+        # total minus survivors, since passengers with no or another Survived
+        # value fall in neither, so it goes to the pipeline like any other value.
+        if 'Survived' in filters and not (_is_number(filters['Survived']) and filters['Survived'] == 1):
+            return False
+        return all(filters[name] in AGE_BOUNDARIES for name in RANGE_FILTERS if name in filters)
+
+    def _from_summary(self, group_by, filters):
+        query = {'count': {'$exists': True}}
+        for name in ('Sex', 'Pclass', 'Embarked'):
+            if name in filters:
+                query[f'_id.{name}'] = filters[name]
+        age_min = filters.get('age_min')
+        age_max = filters.get('age_max')
+        labels = [
+            label for low, high, label in AGE_BUCKETS
+            if (age_min is None or low >= age_min) and (age_max is None or (high is not None and high <= age_max))
+        ]
+        if age_min is not None or age_max is not None:
+            query['_id.AgeBucket'] = {'$in': labels}
+
+        groups = defaultdict(lambda: [0, 0])
+        for cell in self.summary_collection.find(query):
+            count, survived = cell['count'], cell['survived']
+            if 'Survived' in filters:
+                count = survived
+            group = groups[tuple(cell['_id'].get(dimension) for dimension in group_by)]
+            group[0] += count
+            group[1] += survived
+        return [(key, count, survived) for key, (count, survived) in groups.items() if count]
+
+    def _from_pipeline(self, group_by, filters):
+        pipeline = [
+            {'$match': pipeline_match(filters)},
+            {'$group': {
+                '_id': {dimension: _dimension_expression(dimension) for dimension in group_by},
+                'count': {'$sum': 1},
+                'survived': {'$sum': {'$cond': [{'$eq': ['$Survived', 1]}, 1, 0]}},
+            }},
+        ]
+        return [
+            (tuple(row['_id'].get(dimension) for dimension in group_by), row['count'], row['survived'])
+            for row in self.passengers.aggregate(pipeline)
+        ]
+
+    def query(self, group_by, filters):
+        if self._summary_supports(filters) and self.summary_ready():
+            rows, source = self._from_summary(group_by, filters), 'summary'
+        else:
+            rows, source = self._from_pipeline(group_by, filters), 'pipeline'
+
+        groups = []
+        for key, count, survived in sorted(rows, key=lambda row: row[1], reverse=True):
+            group = dict(zip(group_by, key))
+            group.update({
+                'count': count,
+                'survived': survived,
+                'survival_rate': round(survived / count, 4) if count else 0.0,
+            })
+            groups.append(group)
+        return {'groups': groups, 'source': source}
@@ -0,0 +1,211 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import uuid
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from faker import Faker
+
+# Column name and storage kind. uuid columns are stored as 16 raw bytes per
+# row; str columns as a uint32 offsets array followed by the UTF-8 data.
+COLUMNS = [('user_id', 'uuid'), ('email', 'str'), ('name', 'str'), ('position', 'str')]
+CHUNK_SIZE = 50000
+MAGIC = b'FKW1'
+FOOTER_SIZE = struct.calcsize('<Q') + len(MAGIC)
+
+
+def generate_chunk(seed, count):
+    # Seeding per chunk keeps output identical however the chunks are spread
+    # over processes
+    fake = Faker()
+    fake.seed_instance(seed)
+    columns = {name: [] for name, _ in COLUMNS}
+    for _ in range(count):
+        columns['user_id'].append(fake.uuid4())
+        columns['email'].append(fake.email())
+        columns['name'].append(fake.name())
+        columns['position'].append(fake.job())
+    return columns
+
+
+def _generate_chunk_args(args):
+    return generate_chunk(*args)
+
+
+def generate_chunks(num_records, processes=None, chunk_size=CHUNK_SIZE, seed=0):
+    tasks = [(seed + index, min(chunk_size, num_records - start))
+             for index, start in enumerate(range(0, num_records, chunk_size))]
+    processes = processes or os.cpu_count() or 1
+    if processes <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield generate_chunk(*task)
+        return
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        yield from executor.map(_generate_chunk_args, tasks)
+
+
+def row_range(worker, workers, num_records):
+    """Rows [start, stop) of `num_records` that belong to `worker`."""
+    return worker * num_records // workers, (worker + 1) * num_records // workers
+
+
+def _rows(columns):
+    names = [name for name, _ in COLUMNS]
+    return [dict(zip(names, values)) for values in zip(*(columns[name] for name in names))]
+
+
+def _rebatch(chunks, batch_size, limit):
+    batch = []
+    remaining = limit
+    for chunk in chunks:
+        for row in chunk:
+            if remaining == 0:
+                break
+            batch.append(row)
+            remaining -= 1
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if remaining == 0:
+            break
+    if batch:
+        yield batch
+
+
+class InMemoryData:
+    """Generated records kept column-wise in memory."""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.count = sum(len(chunk['user_id']) for chunk in self.chunks)
+
+    def __len__(self):
+        return self.count
+
+    def iter_batches(self, batch_size, limit=None):
+        # Fresh dicts every time, since insert_many adds _id to its documents
+        limit = self.count if limit is None else min(limit, self.count)
+        return _rebatch((_rows(chunk) for chunk in self.chunks), batch_size, limit)
+
+
+def write_fixture(path, chunks):
+    """Write column chunks to a fixture file, one row group per chunk."""
+    row_groups = []
+    total = 0
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        for chunk in chunks:
+            count = len(chunk['user_id'])
+            sections = {}
+            for name, kind in COLUMNS:
+                values = chunk[name]
+                if kind == 'uuid':
+                    position = f.tell()
+                    f.write(b''.join(uuid.UUID(value).bytes for value in values))
+                    sections[name] = [position]
+                else:
+                    encoded = [value.encode('utf-8') for value in values]
+                    offsets = array('I', [0])
+                    size = 0
+                    for value in encoded:
+                        size += len(value)
+                        offsets.append(size)
+                    position = f.tell()
+                    f.write(offsets.tobytes())
+                    sections[name] = [position, f.tell(), size]
+                    f.write(b''.join(encoded))
+            row_groups.append({'count': count, 'sections': sections})
+            total += count
+
+        footer = json.dumps({
+            'columns': COLUMNS,
+            'byteorder': sys.byteorder,
+            'count': total,
+            'row_groups': row_groups,
+        }).encode('utf-8')
+        f.write(footer)
+        f.write(struct.pack('<Q', len(footer)))
+        f.write(MAGIC)
+    os.replace(tmp_path, path)
+    return total
+
+
+class FixtureData:
+    """Records replayed from a memory-mapped fixture file.
+
+    Row groups are independent, so a worker replaying a range of rows only
+    reads the row groups that overlap it and nothing is coordinated.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC or self._map[-len(MAGIC):] != MAGIC:
+            raise ValueError(f"{path} is not a fake worker fixture")
+        footer_size = struct.unpack('<Q', self._map[-FOOTER_SIZE:-len(MAGIC)])[0]
+        footer = json.loads(self._map[-FOOTER_SIZE - footer_size:-FOOTER_SIZE])
+        self.count = footer['count']
+        self.row_groups = footer['row_groups']
+        self._swap = footer['byteorder'] != sys.byteorder
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def read_row_group(self, index):
+        group = self.row_groups[index]
+        count = group['count']
+        columns = {}
+        for name, kind in COLUMNS:
+            section = group['sections'][name]
+            if kind == 'uuid':
+                raw = self._map[section[0]:section[0] + 16 * count]
+                columns[name] = [str(uuid.UUID(bytes=raw[i * 16:(i + 1) * 16])) for i in range(count)]
+            else:
+                position, data_position, size = section
+                offsets = array('I')
+                offsets.frombytes(self._map[position:data_position])
+                if self._swap:
+                    offsets.byteswap()
+                data = self._map[data_position:data_position + size]
+                columns[name] = [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(count)]
+        return _rows(columns)
+
+    def _rows_from(self, start):
+        first_row = 0
+        for index, group in enumerate(self.row_groups):
+            if first_row + group['count'] > start:
+                rows = self.read_row_group(index)
+                yield rows[max(0, start - first_row):]
+            first_row += group['count']
+
+    def iter_batches(self, batch_size, limit=None, start=0):
+        """Batches of up to `limit` rows starting at row `start`."""
+        available = max(0, self.count - start)
+        limit = available if limit is None else min(limit, available)
+        return _rebatch(self._rows_from(start), batch_size, limit)
+
+
+def load_or_generate(num_records, fixture=None, processes=None, chunk_size=CHUNK_SIZE, seed=0):
+    """Return at least `num_records` fake worker records.
+
+    With a fixture path, an existing fixture that is large enough is replayed;
+    otherwise the records are generated in parallel and written to it first.
+    """
+    if fixture:
+        if os.path.exists(fixture):
+            data = FixtureData(fixture)
+            if len(data) >= num_records:
+                return data
+            data.close()
+        write_fixture(fixture, generate_chunks(num_records, processes, chunk_size, seed))
+        return FixtureData(fixture)
+    return InMemoryData(generate_chunks(num_records, processes, chunk_size, seed))
@@ -0,0 +1,115 @@
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from analytics import pipeline_match
+
+# /survived's filters, as the route passes them to SurvivalAnalytics
+SURVIVED_FILTERS = {'Sex': 'male', 'Survived': 1, 'age_max': 45}
+
+# Indexes the passenger routes rely on. The compound index follows the
+# equality-equality-range order of the /survived filter so the count can be
+# answered from the index alone.
+PASSENGER_INDEXES = [
+    {'name': 'PassengerId_unique', 'keys': [('PassengerId', ASCENDING)], 'unique': True},
+    {'name': 'Sex_Survived_Age', 'keys': [('Sex', ASCENDING), ('Survived', ASCENDING), ('Age', ASCENDING)]},
+]
+
+# Representative filters for each route and the index they are expected to use.
+# /survived is normally answered from the small passenger_summary collection;
+# the check covers the passengers pipeline it falls back to before the
+# summary is built.
+QUERY_CHECKS = [
+    {'route': '/read_data, /update_data', 'filter': {'PassengerId': 1}, 'index': 'PassengerId_unique'},
+    {'route': '/survived (pipeline fallback)', 'filter': pipeline_match(SURVIVED_FILTERS),
+     'index': 'Sex_Survived_Age'},
+]
+
+
+def ensure_indexes(collection):
+    created = []
+    for spec in PASSENGER_INDEXES:
+        options = {'name': spec['name']}
+        if spec.get('unique'):
+            options['unique'] = True
+        try:
+            created.append(collection.create_index(spec['keys'], **options))
+        except (DuplicateKeyError, OperationFailure) as e:
+            if not spec.get('unique'):
+                raise
+            # Existing duplicates block a unique index; fall back to a plain
+            # index under the same name so lookups still avoid a collection scan
+            print(f"Could not create unique index {spec['name']}, creating it as non-unique: {e}")
+            created.append(collection.create_index(spec['keys'], name=spec['name']))
+    return created
+
+
+def _plan_details(plan, stages, indexes):
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        if 'indexName' in plan:
+            indexes.append(plan['indexName'])
+        for value in plan.values():
+            _plan_details(value, stages, indexes)
+    elif isinstance(plan, list):
+        for value in plan:
+            _plan_details(value, stages, indexes)
+
+
+def explain_query(collection, query_filter):
+    # queryPlanner only plans the query; find().explain() would also run it
+    # under allPlansExecution
+    explain = collection.database.command('explain', {'find': collection.name, 'filter': query_filter},
+                                          verbosity='queryPlanner')
+    stages, indexes = [], []
+    _plan_details(explain.get('queryPlanner', {}).get('winningPlan', {}), stages, indexes)
+    return {'stages': stages, 'indexes': indexes}
+
+
+def verify_indexes(collection):
+    results = []
+    for check in QUERY_CHECKS:
+        plan = explain_query(collection, check['filter'])
+        results.append({
+            'route': check['route'],
+            'expected_index': check['index'],
+            'used_indexes': plan['indexes'],
+            'stages': plan['stages'],
+            'ok': check['index'] in plan['indexes'] and 'COLLSCAN' not in plan['stages'],
+        })
+    return results
+
+
+def check_indexes(collection):
+    """Warn about routes whose queries are not planned on their index."""
+    results = verify_indexes(collection)
+    for result in results:
+        if not result['ok']:
+            print(f"Warning: {result['route']} is not using index {result['expected_index']} (plan: {result['stages']})")
+    return results
+
+
+def bootstrap_indexes(collection):
+    # Building a unique index scans the whole collection, so this runs as a
+    # one-off step (flask build-indexes) rather than when a worker starts
+    ensure_indexes(collection)
+    return check_indexes(collection)
+
+
+def index_report(collection):
+    usage = {}
+    for stats in collection.aggregate([{'$indexStats': {}}]):
+        usage[stats['name']] = {
+            'operations': stats.get('accesses', {}).get('ops', 0),
+            'since': stats.get('accesses', {}).get('since'),
+        }
+
+    indexes = []
+    for name, info in collection.index_information().items():
+        indexes.append({
+            'name': name,
+            'keys': [[field, direction] for field, direction in info['key']],
+            'unique': info.get('unique', False),
+            'usage': usage.get(name, {}),
+        })
+    return {'indexes': indexes, 'query_plans': verify_indexes(collection)}
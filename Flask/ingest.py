@@ -0,0 +1,210 @@
+import math
+import os
+import queue
+import threading
+import time
+from contextlib import nullcontext
+
+import pandas as pd
+from openpyxl import load_workbook
+from pymongo.errors import BulkWriteError
+
+BATCH_SIZE = 5000
+INSERT_WORKERS = 2
+QUEUE_DEPTH = 4
+SUPPORTED_EXTENSIONS = ('.xlsx', '.csv')
+
+_DONE = object()
+
+
+class IngestCancelled(Exception):
+    pass
+
+
+def _is_empty(value):
+    return value is None or value == '' or (isinstance(value, float) and math.isnan(value))
+
+
+def _is_dropped_column(name):
+    # pandas names header-less columns "Unnamed: N"; openpyxl reports them as None
+    return name is None or str(name).startswith('Unnamed')
+
+
+def _clean(record):
+    # Empty cells are left out of the document, which also drops columns that
+    # are empty for every row
+    return {key: value for key, value in record.items() if not _is_empty(value)}
+
+
+def iter_xlsx_batches(file_path, batch_size=BATCH_SIZE):
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [(index, str(name)) for index, name in enumerate(header) if not _is_dropped_column(name)]
+
+        batch = []
+        for row in rows:
+            record = {name: row[index] for index, name in columns if index < len(row)}
+            record = _clean(record)
+            if record:
+                batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        workbook.close()
+
+
+def iter_csv_batches(file_path, batch_size=BATCH_SIZE):
+    for chunk in pd.read_csv(file_path, chunksize=batch_size):
+        chunk = chunk.loc[:, [not _is_dropped_column(name) for name in chunk.columns]]
+        batch = [_clean(record) for record in chunk.to_dict(orient='records')]
+        batch = [record for record in batch if record]
+        if batch:
+            yield batch
+
+
+def iter_batches(file_path, batch_size=BATCH_SIZE):
+    if file_path.endswith('.csv'):
+        return iter_csv_batches(file_path, batch_size)
+    return iter_xlsx_batches(file_path, batch_size)
+
+
+def memory_mb():
+    # Current resident set size, or None where /proc is not available.
+    # ru_maxrss would be the peak over the whole process, which in a
+    # long-lived worker says nothing about this upload.
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+def ingest_file(collection, file_path, batch_size=BATCH_SIZE, insert_workers=INSERT_WORKERS, queue_depth=QUEUE_DEPTH,
+                progress=None, cancelled=None, on_insert=None, write_lock=None):
+    """Stream a spreadsheet into `collection` in bounded batches.
+
+    A producer thread parses the file while `insert_workers` threads insert the
+    previous batches, so parsing and network I/O overlap and at most
+    `queue_depth` batches are held in memory at once.
+
+    `progress(stats)` is called after every inserted batch and
+    `on_insert(docs)` with the documents of that batch that were actually
+    written. If `cancelled()` returns True the remaining rows are skipped and
+    IngestCancelled is raised. Each batch's insert and on_insert run inside
+    `write_lock()`, a context manager, when one is given.
+
+    `peak_memory_growth_mb` in the returned stats is how far the process's
+    memory rose above where it was when the ingest started, sampled after
+    every batch. Other requests in the same worker count towards it too.
+    """
+    start_time = time.time()
+    batches = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {'rows_parsed': 0, 'rows_inserted': 0, 'batches': 0, 'write_errors': 0}
+    failures = []
+    memory = {'start': memory_mb()}
+    memory['peak'] = memory['start']
+
+    def sample_memory():
+        current = memory_mb()
+        if current is not None:
+            with lock:
+                memory['peak'] = max(memory['peak'], current)
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for batch in iter_batches(file_path, batch_size):
+                if cancelled is not None and cancelled():
+                    stop.set()
+                    failures.append(IngestCancelled(file_path))
+                    return
+                with lock:
+                    stats['rows_parsed'] += len(batch)
+                sample_memory()
+                if not put(batch):
+                    return
+        except Exception as e:
+            failures.append(e)
+            stop.set()
+        finally:
+            for _ in range(insert_workers):
+                put(_DONE)
+
+    def write(batch):
+        try:
+            result = collection.insert_many(batch, ordered=False)
+            inserted, errors = len(result.inserted_ids), 0
+            written = batch
+        except BulkWriteError as e:
+            inserted, errors = e.details.get('nInserted', 0), len(e.details.get('writeErrors', []))
+            failed = {error['index'] for error in e.details.get('writeErrors', [])}
+            written = [doc for index, doc in enumerate(batch) if index not in failed]
+        if on_insert is not None and written:
+            on_insert(written)
+        return inserted, errors
+
+    def consume():
+        while not stop.is_set():
+            try:
+                batch = batches.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if batch is _DONE:
+                return
+            try:
+                with write_lock() if write_lock is not None else nullcontext():
+                    inserted, errors = write(batch)
+            except Exception as e:
+                failures.append(e)
+                stop.set()
+                return
+            sample_memory()
+            with lock:
+                stats['rows_inserted'] += inserted
+                stats['write_errors'] += errors
+                stats['batches'] += 1
+                snapshot = dict(stats)
+            if progress is not None:
+                elapsed = time.time() - start_time
+                snapshot['rows_per_sec'] = round(snapshot['rows_inserted'] / elapsed, 1) if elapsed else 0.0
+                try:
+                    progress(snapshot)
+                except Exception as e:
+                    failures.append(e)
+                    stop.set()
+                    return
+
+    producer = threading.Thread(target=produce, name='ingest-parse')
+    consumers = [threading.Thread(target=consume, name=f'ingest-insert-{n}') for n in range(insert_workers)]
+    producer.start()
+    for consumer in consumers:
+        consumer.start()
+    producer.join()
+    for consumer in consumers:
+        consumer.join()
+
+    if failures:
+        raise failures[0]
+
+    elapsed = time.time() - start_time
+    stats['rows_per_sec'] = round(stats['rows_inserted'] / elapsed, 1) if elapsed else 0.0
+    if memory['start'] is not None:
+        stats['peak_memory_growth_mb'] = round(memory['peak'] - memory['start'], 1)
+    return stats
@@ -1,68 +1,247 @@
-import time
+import argparse
+import asyncio
+import json
+import os
+import queue
 import threading
-import pymongo
-from pymongo import MongoClient
-from faker import Faker
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from pymongo import InsertOne, MongoClient
+
+from fake_workers import FixtureData, InMemoryData, generate_chunk, load_or_generate, row_range
 
-fake = Faker()
-client = MongoClient('mongodb://localhost:27017/')
-db = client['workerdatabase']
+MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017/')
+DB_NAME = 'workerdatabase'
+COLLECTION_NAME = 'workers'
+
+MODES = ['single', 'threaded', 'insert_many', 'bulk_write', 'thread_pool', 'process_pool', 'asyncio']
+
+client = MongoClient(MONGO_URI)
+db = client[DB_NAME]
 collection = db['workers']
 
-def insert_data(user_id, email, name, position):
-    collection.insert_one({
-        'user_id': user_id,
-        'email': email,
-        'name': name,
-        'position': position
-    })
-
-def generate_fake_data():
-    return {
-        'user_id': fake.uuid4(),
-        'email': fake.email(),
-        'name': fake.name(),
-        'position': fake.job()
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(mode, num_records, elapsed, cpu, latencies, **extra):
+    latencies = sorted(latencies)
+    result = {
+        'mode': mode,
+        'records': num_records,
+        'elapsed_sec': round(elapsed, 4),
+        'docs_per_sec': round(num_records / elapsed, 1) if elapsed else 0.0,
+        'batches': len(latencies),
+        'p50_batch_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_batch_ms': round(percentile(latencies, 99) * 1000, 3),
+        'cpu_sec': round(cpu, 4),
+        'cpu_per_1k_docs_ms': round(cpu / num_records * 1e6, 3) if num_records else 0.0,
     }
+    result.update(extra)
+    return result
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+# Benchmark modes. Each takes the generated data (except process_pool, whose
+# workers generate or replay their own share) and returns batch latencies.
+
+def run_single(data, options):
+    return [timed(collection.insert_one, doc) for batch in data.iter_batches(options.batch_size, options.records)
+            for doc in batch]
 
-def insert_without_threading(num_records):
-    start_time = time.time()
-    for _ in range(num_records):
-        data = generate_fake_data()
-        insert_data(data['user_id'], data['email'], data['name'], data['position'])
-    end_time = time.time()
-    print(f"Time taken without threading: {end_time - start_time} seconds")
 
+def run_queue_workers(data, options, insert_batch):
+    # Batches are handed out through a bounded queue, so workers never contend
+    # on a shared lock per record and at most a few batches are in memory
+    batches = queue.Queue(maxsize=options.workers * 2)
+    results = [[] for _ in range(options.workers)]
 
-def insert_with_threading(num_records, num_threads):
-    start_time = time.time()
-    
-    def worker():
+    def worker(latencies):
         while True:
-            with lock:
-                if not data_queue:
-                    break
-                data = data_queue.pop()
-            insert_data(data['user_id'], data['email'], data['name'], data['position'])
-    
-    data_queue = [generate_fake_data() for _ in range(num_records)]
-    lock = threading.Lock()
-    
-    threads = [threading.Thread(target=worker) for _ in range(num_threads)]
+            batch = batches.get()
+            if batch is None:
+                return
+            latencies.extend(insert_batch(batch))
+
+    threads = [threading.Thread(target=worker, args=(latencies,)) for latencies in results]
     for thread in threads:
         thread.start()
+    for batch in data.iter_batches(options.batch_size, options.records):
+        batches.put(batch)
+    for _ in threads:
+        batches.put(None)
     for thread in threads:
         thread.join()
-    
-    end_time = time.time()
-    print(f"Time taken with threading: {end_time - start_time} seconds")
+    return [latency for latencies in results for latency in latencies]
 
-if __name__ == "__main__":
-    num_records = int(input("Enter the number of records to insert: "))
-    use_threading = input("Use threading? (yes/no): ").strip().lower()
-    
-    if use_threading == 'yes':
-        num_threads = int(8)
-        insert_with_threading(num_records, num_threads)
+
+def run_threaded(data, options):
+    # insert_one per record from N threads, the original threading approach
+    return run_queue_workers(data, options, lambda batch: [timed(collection.insert_one, doc) for doc in batch])
+
+
+def run_insert_many(data, options):
+    return [timed(collection.insert_many, batch, ordered=False)
+            for batch in data.iter_batches(options.batch_size, options.records)]
+
+
+def run_bulk_write(data, options):
+    return [
+        timed(collection.bulk_write, [InsertOne(doc) for doc in batch], ordered=False)
+        for batch in data.iter_batches(options.batch_size, options.records)
+    ]
+
+
+def run_thread_pool(data, options):
+    return run_queue_workers(data, options, lambda batch: [timed(collection.insert_many, batch, ordered=False)])
+
+
+_process_collection = None
+
+
+def _init_process_worker(uri):
+    # Each process opens its own client; MongoClient must not cross a fork
+    global _process_collection
+    _process_collection = MongoClient(uri)[DB_NAME][COLLECTION_NAME]
+
+
+def _process_worker(worker, workers, num_records, batch_size, fixture, seed):
+    start_cpu = time.process_time()
+    start, stop = row_range(worker, workers, num_records)
+    if fixture:
+        # Each process replays its own rows straight from the mapped file, so
+        # nothing is pickled across and no process waits on another
+        batches = FixtureData(fixture).iter_batches(batch_size, stop - start, start=start)
     else:
-        insert_without_threading(num_records)
+        batches = InMemoryData([generate_chunk(seed + worker, stop - start)]).iter_batches(batch_size)
+    latencies = [timed(_process_collection.insert_many, batch, ordered=False) for batch in batches]
+    return latencies, time.process_time() - start_cpu
+
+
+def run_process_pool(num_records, options):
+    workers = options.workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_process_worker,
+                             initargs=(options.uri,)) as executor:
+        results = list(executor.map(_process_worker, range(workers), [workers] * workers,
+                                    [num_records] * workers, [options.batch_size] * workers,
+                                    [options.fixture] * workers, [options.seed] * workers))
+    latencies = [latency for result in results for latency in result[0]]
+    child_cpu = sum(result[1] for result in results)
+    return latencies, child_cpu
+
+
+def run_asyncio(data, options):
+    try:
+        from motor.motor_asyncio import AsyncIOMotorClient
+    except ImportError:
+        return None
+
+    async def main():
+        async_collection = AsyncIOMotorClient(options.uri)[DB_NAME][COLLECTION_NAME]
+        batches = asyncio.Queue(maxsize=options.workers * 2)
+        latencies = []
+
+        async def consumer():
+            while True:
+                batch = await batches.get()
+                if batch is None:
+                    return
+                start = time.perf_counter()
+                await async_collection.insert_many(batch, ordered=False)
+                latencies.append(time.perf_counter() - start)
+
+        consumers = [asyncio.create_task(consumer()) for _ in range(options.workers)]
+        for batch in data.iter_batches(options.batch_size, options.records):
+            await batches.put(batch)
+        for _ in consumers:
+            await batches.put(None)
+        await asyncio.gather(*consumers)
+        return latencies
+
+    return asyncio.run(main())
+
+
+RUNNERS = {
+    'single': run_single,
+    'threaded': run_threaded,
+    'insert_many': run_insert_many,
+    'bulk_write': run_bulk_write,
+    'thread_pool': run_thread_pool,
+    'asyncio': run_asyncio,
+}
+
+
+def run_mode(mode, data, options):
+    if options.drop:
+        collection.drop()
+    num_records = min(options.records, len(data))
+
+    if mode == 'process_pool':
+        start_cpu = time.process_time()
+        start = time.perf_counter()
+        latencies, child_cpu = run_process_pool(num_records, options)
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - start_cpu + child_cpu
+        return summarize(mode, num_records, elapsed, cpu, latencies, workers=options.workers,
+                         batch_size=options.batch_size, includes_generation=not options.fixture)
+
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    latencies = RUNNERS[mode](data, options)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - start_cpu
+
+    if latencies is None:
+        return {'mode': mode, 'skipped': 'motor is not installed (pip install motor)'}
+    return summarize(mode, num_records, elapsed, cpu, latencies, workers=options.workers,
+                     batch_size=options.batch_size, includes_generation=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MongoDB write-throughput benchmark")
+    parser.add_argument('--records', type=int, default=10000, help="Documents to insert per mode")
+    parser.add_argument('--mode', action='append', choices=MODES + ['all'],
+                        help="Mode to run (repeatable, default: all)")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Documents per insert_many/bulk_write call")
+    parser.add_argument('--workers', type=int, default=8, help="Threads, processes or concurrent tasks")
+    parser.add_argument('--uri', default=MONGO_URI)
+    parser.add_argument('--no-drop', dest='drop', action='store_false',
+                        help="Keep existing documents instead of dropping the collection before each mode")
+    parser.add_argument('--fixture', help="Fixture file to replay, generated on first use or when too small")
+    parser.add_argument('--gen-processes', type=int, default=None,
+                        help="Processes used to generate data (default: CPU count)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the generated data")
+    options = parser.parse_args()
+
+    global client, db, collection
+    if options.uri != MONGO_URI:
+        client = MongoClient(options.uri)
+        db = client[DB_NAME]
+        collection = db[COLLECTION_NAME]
+
+    # Data is generated (or loaded) once, outside every timed section
+    start = time.perf_counter()
+    data = load_or_generate(options.records, options.fixture, options.gen_processes, seed=options.seed)
+    generation = {
+        'records': len(data),
+        'source': 'fixture' if options.fixture else 'generated',
+        'elapsed_sec': round(time.perf_counter() - start, 4),
+    }
+
+    modes = MODES if not options.mode or 'all' in options.mode else options.mode
+    results = [run_mode(mode, data, options) for mode in modes]
+    print(json.dumps({'generation': generation, 'results': results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,33 @@
 from flask import Flask, request, jsonify
-import pandas as pd
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
 import os
 import time
+from ingest import SUPPORTED_EXTENSIONS
+from upload_jobs import UploadJobs
+from indexes import bootstrap_indexes, check_indexes, index_report
+from analytics import SurvivalAnalytics, validate_query
 
 app = Flask(__name__)
 
 client = MongoClient('mongodb://localhost:27017/')
 db = client['passenger_database']
 collection = db['passengers']
+jobs_collection = db['upload_jobs']
+summary_collection = db['passenger_summary']
+
+# Pre-aggregated survival counts, kept current by /upload and /update_data
+analytics = SurvivalAnalytics(collection, summary_collection)
+
+# Indexes are built by `flask --app py-mongo-3 build-indexes`; workers only
+# check the query plans, which is cheap
+try:
+    check_indexes(collection)
+except Exception as e:
+    print(f"Could not check passenger indexes: {e}")
+
+# Files are ingested in the background; UPLOAD_WORKERS caps concurrent ingestions per process
+upload_jobs = UploadJobs(collection, jobs_collection, max_workers=int(os.environ.get('UPLOAD_WORKERS', 2)),
+                         on_insert=analytics.apply, write_lock=analytics.writing)
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
@@ -24,18 +43,44 @@ def upload_file():
         elapsed_time = time.time() - start_time  
         return jsonify({'error': 'File does not exist', 'elapsed_time': elapsed_time}), 400
 
-    if not file_path.endswith('.xlsx'):
+    if not file_path.endswith(SUPPORTED_EXTENSIONS):
         elapsed_time = time.time() - start_time  
-        return jsonify({'error': 'Invalid file format. Only .xlsx files are allowed.', 'elapsed_time': elapsed_time}), 400
+        return jsonify({'error': 'Invalid file format. Only .xlsx and .csv files are allowed.', 'elapsed_time': elapsed_time}), 400
 
     try:
-        df = pd.read_excel(file_path)
-        df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-        df = df.dropna(axis=1, how='all')
-        data = df.to_dict(orient='records')
-        collection.insert_many(data)
+        job_id = upload_jobs.submit(file_path)
         elapsed_time = time.time() - start_time  
-        return jsonify({'message': 'File successfully uploaded and data inserted into MongoDB', 'elapsed_time': elapsed_time}), 200
+        return jsonify({'message': 'Upload job queued', 'job_id': job_id, 'status_url': f'/upload/{job_id}', 'elapsed_time': elapsed_time}), 202
+    except Exception as e:
+        elapsed_time = time.time() - start_time
+        return jsonify({'error': 'Unexpected error', 'details': str(e), 'elapsed_time': elapsed_time}), 500
+
+@app.route('/upload/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    start_time = time.time()
+    try:
+        job = upload_jobs.get(job_id)
+        elapsed_time = time.time() - start_time
+
+        if job:
+            return jsonify(job | {'elapsed_time': elapsed_time}), 200
+        else:
+            return jsonify({'error': 'Upload job not found', 'elapsed_time': elapsed_time}), 404
+    except Exception as e:
+        elapsed_time = time.time() - start_time
+        return jsonify({'error': 'Unexpected error', 'details': str(e), 'elapsed_time': elapsed_time}), 500
+
+@app.route('/upload/<job_id>', methods=['DELETE'])
+def cancel_upload(job_id):
+    start_time = time.time()
+    try:
+        cancelled = upload_jobs.cancel(job_id)
+        elapsed_time = time.time() - start_time
+
+        if cancelled:
+            return jsonify({'message': 'Cancellation requested', 'job_id': job_id, 'elapsed_time': elapsed_time}), 202
+        else:
+            return jsonify({'error': 'No queued or running upload job with this id', 'elapsed_time': elapsed_time}), 404
     except Exception as e:
         elapsed_time = time.time() - start_time
         return jsonify({'error': 'Unexpected error', 'details': str(e), 'elapsed_time': elapsed_time}), 500
@@ -87,10 +132,17 @@ def update_data():
             return jsonify({'error': 'No data provided', 'elapsed_time': elapsed_time}), 400
 
         update_data = request.json
-        result = collection.update_one({'PassengerId': passenger_id}, {'$set': update_data})
+        with analytics.writing():
+            previous = collection.find_one_and_update(
+                {'PassengerId': passenger_id},
+                {'$set': update_data},
+                return_document=ReturnDocument.BEFORE
+            )
+            if previous:
+                analytics.move(previous, previous | update_data)
         elapsed_time = time.time() - start_time
 
-        if result.matched_count:
+        if previous:
             return jsonify({'message': 'Record updated successfully', 'elapsed_time': elapsed_time}), 200
         else:
             return jsonify({'error': 'Record not found', 'elapsed_time': elapsed_time}), 404
@@ -113,11 +165,8 @@ def survived_count():
             elapsed_time = time.time() - start_time
             return jsonify({'error': 'Invalid Sex value. Must be "male" or "female"', 'elapsed_time': elapsed_time}), 400
         
-        count = collection.count_documents({
-            'Sex': sex,
-            'Survived': 1,  
-            'Age': {'$lt': 45}
-        })
+        result = analytics.query([], {'Sex': sex, 'Survived': 1, 'age_max': 45})
+        count = result['groups'][0]['count'] if result['groups'] else 0
         
         elapsed_time = time.time() - start_time
         return jsonify({'count': count, 'elapsed_time': elapsed_time}), 200
@@ -125,5 +174,50 @@ def survived_count():
         elapsed_time = time.time() - start_time
         return jsonify({'error': 'Unexpected error', 'details': str(e), 'elapsed_time': elapsed_time}), 500
 
+@app.route('/analytics/survival', methods=['POST'])
+def survival_analytics():
+    start_time = time.time()
+    try:
+        payload = request.json or {}
+        group_by = payload.get('group_by', [])
+        filters = payload.get('filters', {})
+
+        if not isinstance(group_by, list) or not isinstance(filters, dict):
+            elapsed_time = time.time() - start_time
+            return jsonify({'error': 'group_by must be a list and filters an object', 'elapsed_time': elapsed_time}), 400
+
+        error = validate_query(group_by, filters)
+        if error:
+            elapsed_time = time.time() - start_time
+            return jsonify({'error': error, 'elapsed_time': elapsed_time}), 400
+
+        result = analytics.query(group_by, filters)
+        elapsed_time = time.time() - start_time
+        return jsonify(result | {'elapsed_time': elapsed_time}), 200
+    except Exception as e:
+        elapsed_time = time.time() - start_time
+        return jsonify({'error': 'Unexpected error', 'details': str(e), 'elapsed_time': elapsed_time}), 500
+
+@app.cli.command('rebuild-summary')
+def rebuild_summary():
+    cells = analytics.rebuild()
+    print(f"Rebuilt passenger survival summary ({cells} cells).")
+
+@app.cli.command('build-indexes')
+def build_indexes():
+    results = bootstrap_indexes(collection)
+    print(f"Passenger indexes built; {sum(result['ok'] for result in results)}/{len(results)} query checks pass.")
+
+@app.route('/admin/indexes', methods=['GET'])
+def admin_indexes():
+    start_time = time.time()
+    try:
+        report = index_report(collection)
+        elapsed_time = time.time() - start_time
+        return jsonify(report | {'elapsed_time': elapsed_time}), 200
+    except Exception as e:
+        elapsed_time = time.time() - start_time
+        return jsonify({'error': 'Unexpected error', 'details': str(e), 'elapsed_time': elapsed_time}), 500
+
 if __name__ == '__main__':
     app.run(debug=True)
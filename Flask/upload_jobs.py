@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from pymongo.errors import PyMongoError
+
+from ingest import IngestCancelled, ingest_file
+
+ACTIVE_STATUSES = ('queued', 'running')
+# Active jobs are touched this often by the process running them
+HEARTBEAT_INTERVAL = float(os.environ.get('UPLOAD_JOB_HEARTBEAT', 10))
+# A job whose process has stopped heartbeating for this long (gunicorn
+# recycled or killed the worker) is marked failed
+STALE_AFTER = float(os.environ.get('UPLOAD_JOB_STALE_AFTER', 60))
+
+
+class UploadJobs:
+    """Runs /upload ingestions in the background.
+
+    Job state lives in `jobs_collection`, so any worker process can report
+    progress or accept a cancellation; the job itself runs on this process's
+    thread pool, which caps how many files are ingested at once.
+
+    While a job is queued or running, its process refreshes `updated_at`
+    every `heartbeat_interval` seconds. Jobs left active by a worker that
+    exited are marked failed once the heartbeat is `stale_after` seconds
+    old, at startup and whenever they are looked up.
+    """
+
+    def __init__(self, collection, jobs_collection, max_workers=2, progress_interval=1.0, on_insert=None,
+                 write_lock=None, heartbeat_interval=HEARTBEAT_INTERVAL, stale_after=STALE_AFTER):
+        self.collection = collection
+        self.jobs_collection = jobs_collection
+        self.on_insert = on_insert
+        self.write_lock = write_lock
+        self.progress_interval = progress_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upload-job')
+        self._owned = set()
+        self._owned_lock = threading.Lock()
+        self._heartbeat_pid = None
+        try:
+            self.fail_stale()
+        except PyMongoError as e:
+            print(f"Could not check for abandoned upload jobs: {e}")
+
+    def submit(self, file_path):
+        job_id = uuid.uuid4().hex
+        self.jobs_collection.insert_one({
+            '_id': job_id,
+            'file_path': file_path,
+            'status': 'queued',
+            'cancel_requested': False,
+            'rows_parsed': 0,
+            'rows_inserted': 0,
+            'write_errors': 0,
+            'rows_per_sec': 0.0,
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
+        })
+        with self._owned_lock:
+            self._owned.add(job_id)
+        self._ensure_heartbeat()
+        self.executor.submit(self._run, job_id, file_path)
+        return job_id
+
+    def fail_stale(self, job_id=None):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        query = {'status': {'$in': list(ACTIVE_STATUSES)}, 'updated_at': {'$lt': cutoff}}
+        if job_id is not None:
+            query['_id'] = job_id
+        result = self.jobs_collection.update_many(query, {'$set': {
+            'status': 'failed',
+            'error': 'The worker running this job exited before it finished',
+            'finished_at': datetime.utcnow(),
+        }})
+        return result.modified_count
+
+    def get(self, job_id):
+        self.fail_stale(job_id)
+        job = self.jobs_collection.find_one({'_id': job_id})
+        if job:
+            job['job_id'] = job.pop('_id')
+        return job
+
+    def cancel(self, job_id):
+        result = self.jobs_collection.update_one(
+            {'_id': job_id, 'status': {'$in': list(ACTIVE_STATUSES)}},
+            {'$set': {'cancel_requested': True}}
+        )
+        return result.matched_count > 0
+
+    def _update(self, job_id, fields):
+        self.jobs_collection.update_one({'_id': job_id}, {'$set': dict(fields, updated_at=datetime.utcnow())})
+
+    def _ensure_heartbeat(self):
+        # Threads do not survive a fork, so a forked worker starts its own
+        if self._heartbeat_pid == os.getpid():
+            return
+        self._heartbeat_pid = os.getpid()
+        threading.Thread(target=self._heartbeat, name='upload-job-heartbeat', daemon=True).start()
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._owned_lock:
+                owned = list(self._owned)
+            if not owned:
+                continue
+            try:
+                self.jobs_collection.update_many(
+                    {'_id': {'$in': owned}, 'status': {'$in': list(ACTIVE_STATUSES)}},
+                    {'$set': {'updated_at': datetime.utcnow()}}
+                )
+            except PyMongoError as e:
+                print(f"Upload job heartbeat failed: {e}")
+
+    def _run(self, job_id, file_path):
+        job = self.jobs_collection.find_one_and_update(
+            {'_id': job_id, 'cancel_requested': False},
+            {'$set': {'status': 'running', 'started_at': datetime.utcnow(), 'updated_at': datetime.utcnow()}}
+        )
+        try:
+            if job is None:
+                self._update(job_id, {'status': 'cancelled', 'finished_at': datetime.utcnow()})
+                return
+            self._ingest(job_id, file_path)
+        finally:
+            with self._owned_lock:
+                self._owned.discard(job_id)
+
+    def _ingest(self, job_id, file_path):
+        # Progress writes and cancellation checks are throttled so a fast
+        # ingestion does not turn into one jobs_collection round trip per batch
+        last_check = [0.0]
+        cancel_seen = [False]
+
+        def progress(stats):
+            now = time.monotonic()
+            if now - last_check[0] < self.progress_interval:
+                return
+            last_check[0] = now
+            job = self.jobs_collection.find_one_and_update(
+                {'_id': job_id},
+                {'$set': dict({key: stats[key] for key in ('rows_parsed', 'rows_inserted', 'write_errors',
+                                                           'rows_per_sec')}, updated_at=datetime.utcnow())},
+                projection={'cancel_requested': 1}
+            )
+            cancel_seen[0] = bool(job and job.get('cancel_requested'))
+
+        try:
+            stats = ingest_file(self.collection, file_path, progress=progress, cancelled=lambda: cancel_seen[0],
+                                on_insert=self.on_insert, write_lock=self.write_lock)
+        except IngestCancelled:
+            self._update(job_id, {'status': 'cancelled', 'finished_at': datetime.utcnow()})
+        except Exception as e:
+            self._update(job_id, {'status': 'failed', 'error': str(e), 'finished_at': datetime.utcnow()})
+        else:
+            self._update(job_id, dict(stats, status='completed', finished_at=datetime.utcnow()))
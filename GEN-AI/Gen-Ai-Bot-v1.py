@@ -1,5 +1,6 @@
-import requests
-import json
+from conversation import Conversation
+from gemini_client import GEMINI_STREAM, GeminiError, generate, log_error, print_stream, stream_generate
+from response_cache import CACHE_ENABLED, ResponseCache
 
 system_prompt = """
 
@@ -16,39 +17,39 @@ Examples of how you might assist:
 
 """
 
-def get_response(user_input, conversation_history):
-    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent?key=API_KEY"
-    conversation_history.append({"role": "user", "content": user_input})
-    payload = json.dumps({
-        "contents": [
-            {
-                "parts": [
-                    {
-                        "text": f"""{system_prompt}\n\n{' '.join([f"{entry['role']}: {entry['content']}" for entry in conversation_history])}"""
-                    }
-                ]
-            }
-        ]
-    })
-    headers = {
-        'Content-Type': 'application/json'
-    }
-    response = requests.request("POST", url, headers=headers, data=payload)
-    response_json = json.loads(response.text)
-    ai_response = response_json['candidates'][0]['content']['parts'][0]['text']
-    conversation_history.append({"role": "assistant", "content": ai_response})
+def get_response(user_input, conversation, stream=GEMINI_STREAM):
+    context = response_cache.context(conversation.history) if response_cache else []
+    cached_response, _ = response_cache.get(system_prompt, context, user_input) if response_cache else (None, None)
+    conversation.add_user(user_input)
+    prompt_text = conversation.prompt_text()
 
     print(f"\nUser: {user_input}")
-    print(f"Bot: {ai_response}\n")
+    try:
+        if cached_response is not None:
+            ai_response = cached_response
+            print(f"Bot: {ai_response}\n")
+        elif stream:
+            ai_response = print_stream(stream_generate(prompt_text))
+        else:
+            ai_response = generate(prompt_text)
+            print(f"Bot: {ai_response}\n")
+        if cached_response is None and response_cache:
+            response_cache.put(system_prompt, context, user_input, ai_response)
+    except GeminiError as e:
+        ai_response = "I'm sorry, I can't reach the assistant right now. Please try again in a moment."
+        print(f"Bot: {ai_response}\n")
+        log_error("Gemini call failed", e)
+    conversation.add_assistant(ai_response)
     return ai_response
 
-conversation_history = []
+conversation = Conversation(system_prompt)
+response_cache = ResponseCache() if CACHE_ENABLED else None
 
 print("Start chatting with the Spotify AI assistant (type 'quit', 'exit', or 'bye' to end):")
 initial_input = input("What would you like to ask the AI assistant first?\nYou: ")
 
 if initial_input.lower() not in ["quit", "exit", "bye"]:
-    ai_response = get_response(initial_input, conversation_history)
+    ai_response = get_response(initial_input, conversation)
 
     while True:
         user_input = input("You: ")
@@ -56,6 +57,6 @@ if initial_input.lower() not in ["quit", "exit", "bye"]:
             print("Conversation ended.")
             break
         else:
-            ai_response = get_response(user_input, conversation_history)
+            ai_response = get_response(user_input, conversation)
 else:
     print("Conversation ended.")
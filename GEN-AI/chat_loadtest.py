@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+MESSAGES = [
+    "How do I create a Spotify account?",
+    "I forgot my password, how can I reset it?",
+    "Recommend me a playlist",
+    "Can you suggest a tamil playlist?",
+    "How do I cancel my premium subscription?",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+def summarize(name, latencies):
+    return {
+        "name": name,
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies, default=0) * 1000, 1),
+    }
+
+
+async def register(client, phone):
+    response = await client.post('/users', json={"phone": phone, "full_name": f"Load Test {phone}",
+                                                  "language": ["hindi", "tamil"]})
+    if response.status_code not in (201, 409):
+        response.raise_for_status()
+
+
+async def run_session(client, phone, messages, results):
+    start = time.perf_counter()
+    response = await client.post('/sessions', json={"phone": phone})
+    response.raise_for_status()
+    results['login'].append(time.perf_counter() - start)
+    session_id = response.json()['session_id']
+    for message in messages:
+        turn_start = time.perf_counter()
+        response = await client.post(f'/sessions/{session_id}/messages', json={"message": message})
+        response.raise_for_status()
+        results['turn'].append(time.perf_counter() - turn_start)
+        if response.json()['logged_out']:
+            break
+    else:
+        await client.delete(f'/sessions/{session_id}')
+    results['session'].append(time.perf_counter() - start)
+
+
+async def run_load(args):
+    phones = [f"9{index:09d}" for index in range(args.sessions)]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def bounded(coro):
+            async with semaphore:
+                return await coro
+
+        await asyncio.gather(*(bounded(register(client, phone)) for phone in phones))
+
+        results = {'login': [], 'turn': [], 'session': []}
+        errors = 0
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *(bounded(run_session(client, phone, random.choices(MESSAGES, k=args.messages) + ["bye"], results))
+              for phone in phones),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - start
+        for outcome in outcomes:
+            if isinstance(outcome, Exception):
+                errors += 1
+                if errors <= 5:
+                    print(f"Session failed: {outcome!r}")
+
+    completed = len(results['session'])
+    return {
+        "sessions": args.sessions,
+        "completed": completed,
+        "errors": errors,
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "sessions_per_s": round(completed / elapsed, 1) if elapsed else 0.0,
+        "turns_per_s": round(len(results['turn']) / elapsed, 1) if elapsed else 0.0,
+        "latency": [summarize(name, latencies) for name, latencies in results.items()],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test chat_server.py with concurrent chat sessions")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--sessions', type=int, default=200, help="chat sessions to run")
+    parser.add_argument('--concurrency', type=int, default=50, help="sessions in flight at once")
+    parser.add_argument('--messages', type=int, default=3, help="messages per session before saying bye")
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    print(json.dumps(asyncio.run(run_load(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
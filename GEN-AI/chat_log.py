@@ -0,0 +1,219 @@
+import atexit
+import os
+import threading
+from collections import OrderedDict, defaultdict, deque
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+# 'document': one document per phone in `chat` with a list per day, as
+# Gen-Ai-Bot-v2.py always stored it. 'daily': one document per phone per day
+# in `chat_buckets`. 'turns': documents of at most CHAT_LOG_BUCKET_TURNS
+# turns in `chat_buckets`, numbered per phone by `seq`.
+SCHEMAS = ['document', 'daily', 'turns']
+CHAT_LOG_SCHEMA = os.environ.get('CHAT_LOG_SCHEMA', 'document')
+BUCKET_TURNS = int(os.environ.get('CHAT_LOG_BUCKET_TURNS', 100))
+FLUSH_INTERVAL = float(os.environ.get('CHAT_LOG_FLUSH_INTERVAL', 0.5))
+BATCH_SIZE = int(os.environ.get('CHAT_LOG_BATCH_SIZE', 500))
+# Turns buffered before log() writes them itself instead of leaving it to
+# the flusher thread
+MAX_BUFFER = int(os.environ.get('CHAT_LOG_MAX_BUFFER', 10000))
+
+BUCKET_COLLECTION = 'chat_buckets'
+# Open turn buckets remembered per process
+MAX_OPEN_BUCKETS = 10000
+
+
+def collection_for(db, schema):
+    return db['chat'] if schema == 'document' else db[BUCKET_COLLECTION]
+
+
+def ensure_indexes(collection, schema):
+    if schema == 'daily':
+        collection.create_index([("phone", ASCENDING), ("date", ASCENDING)], unique=True)
+    elif schema == 'turns':
+        collection.create_index([("phone", ASCENDING), ("seq", ASCENDING)], unique=True)
+    else:
+        collection.create_index("phone")
+
+
+def day_update(phone, date_str, turns, schema):
+    """The UpdateOne that appends one phone's `turns` for a day."""
+    if schema == 'document':
+        entries = [{"User": turn["User"], "Bot": turn["Bot"]} for turn in turns]
+        return UpdateOne({"phone": phone}, {"$push": {f"chat.{date_str}": {"$each": entries}}}, upsert=True)
+    return UpdateOne({"phone": phone, "date": date_str}, {
+        "$push": {"turns": {"$each": turns}},
+        "$inc": {"count": len(turns)},
+        "$min": {"start": turns[0]["at"]},
+        "$max": {"end": turns[-1]["at"]},
+    }, upsert=True)
+
+
+def turn_update(phone, seq, turn, bucket_turns=BUCKET_TURNS):
+    # Appends to bucket `seq` while it has room. If another process filled
+    # it first, the upsert collides with it on the unique (phone, seq) index
+    # and the writer moves on to the next bucket.
+    return UpdateOne({"phone": phone, "seq": seq, "count": {"$lt": bucket_turns}},
+                     {"$push": {"turns": turn}, "$inc": {"count": 1},
+                      "$min": {"start": turn["at"]}, "$max": {"end": turn["at"]}},
+                     upsert=True)
+
+
+class ChatLogWriter:
+    """Buffers chat turns and writes them with bulk_write off the chat's path.
+
+    log() only appends to an in-memory buffer. A background thread flushes
+    it every `flush_interval` seconds, or as soon as `batch_size` turns are
+    waiting, as one ordered bulk_write in which the turns of the same phone
+    and day share an update. Turns that could not be written because of a
+    connection error are put back at the front of the buffer and retried on
+    the next flush, so a turn may occasionally be written twice. Anything
+    still buffered is written when the process exits.
+    """
+
+    def __init__(self, collection, schema=CHAT_LOG_SCHEMA, bucket_turns=BUCKET_TURNS, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, max_buffer=MAX_BUFFER):
+        if schema not in SCHEMAS:
+            raise ValueError(f"Unknown chat log schema {schema!r}, expected one of {', '.join(SCHEMAS)}")
+        self.collection = collection
+        self.schema = schema
+        self.bucket_turns = bucket_turns
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        # phone -> [seq, count] of its open turn bucket, as far as we know
+        self._open_buckets = OrderedDict()
+        # Only one flush at a time, so turns reach Mongo in order
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+        atexit.register(self.close)
+
+    def log(self, phone, user_input, ai_response, at=None):
+        """Buffer one turn. Blocks on a flush only when the buffer is full()."""
+        at = at or datetime.now()
+        with self._lock:
+            self._buffer.append((phone, {"User": user_input, "Bot": ai_response, "at": at}))
+            waiting = len(self._buffer)
+        self._ensure_flushing()
+        if waiting >= self.max_buffer:
+            # Mongo is not keeping up; write from here rather than buffer without bound
+            self.flush()
+        elif waiting >= self.batch_size:
+            self._wake.set()
+
+    def full(self):
+        """True when the next log() would flush in the caller."""
+        with self._lock:
+            return len(self._buffer) + 1 >= self.max_buffer
+
+    def _take(self):
+        with self._lock:
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+        return batch
+
+    def _requeue(self, turns):
+        with self._lock:
+            self._buffer.extendleft(reversed(turns))
+
+    def _open_bucket(self, phone):
+        bucket = self._open_buckets.get(phone)
+        if bucket is None:
+            latest = self.collection.find_one({"phone": phone}, {"seq": 1, "count": 1}, sort=[("seq", DESCENDING)])
+            bucket = [latest["seq"], latest["count"]] if latest else [0, 0]
+            self._open_buckets[phone] = bucket
+            while len(self._open_buckets) > MAX_OPEN_BUCKETS:
+                self._open_buckets.popitem(last=False)
+        self._open_buckets.move_to_end(phone)
+        return bucket
+
+    def _operations(self, batch):
+        # Returns the operations and, for each, the turns it writes, so a
+        # failure can requeue exactly what was not written
+        if self.schema == 'turns':
+            operations = []
+            for phone, turn in batch:
+                bucket = self._open_bucket(phone)
+                if bucket[1] >= self.bucket_turns:
+                    bucket[0], bucket[1] = bucket[0] + 1, 0
+                bucket[1] += 1
+                operations.append(turn_update(phone, bucket[0], turn, self.bucket_turns))
+            return operations, [[entry] for entry in batch]
+
+        groups = defaultdict(list)
+        for phone, turn in batch:
+            groups[(phone, turn["at"].strftime("%Y-%m-%d"))].append((phone, turn))
+        operations = [day_update(phone, date_str, [turn for _, turn in entries], self.schema)
+                      for (phone, date_str), entries in groups.items()]
+        return operations, list(groups.values())
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of turns written."""
+        total = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take()
+                if not batch:
+                    return total
+                try:
+                    # The turns schema reads the open buckets, which can fail too
+                    operations, written = self._operations(batch)
+                    self.collection.bulk_write(operations, ordered=True)
+                except BulkWriteError as e:
+                    # Ordered, so everything before the first error was applied.
+                    # A duplicate key means another process created the same
+                    # bucket first and is worth retrying; any other write error
+                    # would fail again, so those turns are dropped.
+                    self._open_buckets.clear()
+                    error = e.details['writeErrors'][0]
+                    failed = error['index']
+                    if error['code'] == 11000:
+                        self._requeue([turn for entries in written[failed:] for turn in entries])
+                        total += sum(len(entries) for entries in written[:failed])
+                        continue
+                    self._requeue([turn for entries in written[failed + 1:] for turn in entries])
+                    print(f"Chat log write failed: {error.get('errmsg')}")
+                    return total + sum(len(entries) for entries in written[:failed])
+                except PyMongoError as e:
+                    self._open_buckets.clear()
+                    self._requeue(batch)
+                    print(f"Chat log write failed, will retry {len(batch)} turns: {e}")
+                    return total
+                total += len(batch)
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def _ensure_flushing(self):
+        # Threads do not survive a fork, so a forked worker starts its own
+        # flusher on first use
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='chat-log-flusher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Chat log flush failed: {e}")
+
+    def close(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
+            self._thread = None
+        self.flush()
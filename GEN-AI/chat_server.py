@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import functools
+import os
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from motor.motor_asyncio import AsyncIOMotorClient
+from pydantic import BaseModel
+from pymongo import MongoClient
+
+from chat_log import CHAT_LOG_SCHEMA, ChatLogWriter, collection_for, ensure_indexes
+from conversation import Conversation, summarize_with_client
+from gemini_client import AsyncGeminiClient, GeminiError, log_error
+from prompt_cache import PromptCache, RecommendationCatalogue
+from spotify_assistant import FALLBACK_RESPONSE, is_logout, is_valid_phone
+
+MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017/')
+MONGO_POOL_SIZE = int(os.environ.get('MONGO_POOL_SIZE', 100))
+# Sessions with no message for this long are dropped
+SESSION_IDLE_TIMEOUT = float(os.environ.get('CHAT_SESSION_IDLE_TIMEOUT', 1800))
+# Open sessions allowed before new logins are refused with 503
+MAX_SESSIONS = int(os.environ.get('CHAT_MAX_SESSIONS', 10000))
+
+app = FastAPI(title="Spotify assistant chat server")
+state = {}
+
+
+class Registration(BaseModel):
+    phone: str
+    full_name: str
+    language: list[str]
+
+
+class Login(BaseModel):
+    phone: str
+
+
+class Message(BaseModel):
+    message: str
+
+
+class Session:
+    def __init__(self, phone, user_data, conversation):
+        self.id = uuid.uuid4().hex
+        self.phone = phone
+        self.user_data = user_data
+        self.conversation = conversation
+        self.last_seen = time.monotonic()
+        # One turn at a time per session, so replies stay in order
+        self.lock = asyncio.Lock()
+
+
+@app.on_event("startup")
+async def startup():
+    client = AsyncIOMotorClient(MONGO_URI, maxPoolSize=MONGO_POOL_SIZE)
+    db = client['spotify_bot']
+    # The catalogue refresher and the chat log flusher run on their own
+    # threads, which need a blocking client
+    sync_client = MongoClient(MONGO_URI, maxPoolSize=4)
+    sync_db = sync_client['spotify_bot']
+    catalogue = RecommendationCatalogue(sync_db['recommendation'])
+    chat_log = ChatLogWriter(collection_for(sync_db, CHAT_LOG_SCHEMA))
+    state.update(
+        mongo=client,
+        sync_client=sync_client,
+        catalogue=catalogue,
+        prompt_cache=PromptCache(catalogue),
+        chat_log=chat_log,
+        users=db['users'],
+        gemini=AsyncGeminiClient(),
+        sessions={},
+    )
+    await db['users'].create_index("phone")
+    await asyncio.to_thread(ensure_indexes, chat_log.collection, chat_log.schema)
+    await asyncio.to_thread(catalogue.get)
+    state['reaper'] = asyncio.create_task(reap_idle_sessions())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    state['reaper'].cancel()
+    state['catalogue'].close()
+    await asyncio.to_thread(state['chat_log'].close)
+    await state['gemini'].aclose()
+    state['mongo'].close()
+    state['sync_client'].close()
+
+
+async def reap_idle_sessions():
+    while True:
+        await asyncio.sleep(min(60, SESSION_IDLE_TIMEOUT))
+        cutoff = time.monotonic() - SESSION_IDLE_TIMEOUT
+        sessions = state['sessions']
+        for session_id in [sid for sid, session in sessions.items() if session.last_seen < cutoff]:
+            sessions.pop(session_id, None)
+
+
+async def get_user_data(phone):
+    user_data = await state['users'].find_one({"phone": phone})
+    system_prompt = state['prompt_cache'].get(user_data) if user_data else None
+    return user_data, system_prompt
+
+
+async def open_session(phone):
+    if not is_valid_phone(phone):
+        raise HTTPException(400, "Invalid phone number. Please enter a valid 10-digit phone number.")
+    if len(state['sessions']) >= MAX_SESSIONS:
+        raise HTTPException(503, "Too many open chats, please try again later.")
+    user_data, system_prompt = await get_user_data(phone)
+    if not user_data:
+        raise HTTPException(404, "This phone number is not registered. Please register to start chatting.")
+    # Summaries go through the same client, and concurrency limit, as replies
+    conversation = Conversation(system_prompt, summarize=functools.partial(summarize_with_client, state['gemini']),
+                                loop=asyncio.get_running_loop())
+    session = Session(phone, user_data, conversation)
+    state['sessions'][session.id] = session
+    return session
+
+
+def get_session(session_id):
+    session = state['sessions'].get(session_id)
+    if session is None:
+        raise HTTPException(404, "Unknown or expired session.")
+    return session
+
+
+async def iter_response(session, user_input):
+    """Yield the reply piece by piece, then record the turn.
+
+    The assembled reply goes into the conversation and the `chat`
+    collection once it is complete, as in Gen-Ai-Bot-v2.py; a session that
+    logs out is closed.
+    """
+    conversation = session.conversation
+    session.last_seen = time.monotonic()
+    conversation.add_user(user_input)
+    pieces = []
+    try:
+        async for chunk in state['gemini'].stream_generate(conversation.prompt_text()):
+            pieces.append(chunk)
+            yield chunk
+    except (KeyError, IndexError, ValueError, GeminiError) as e:
+        log_error("Gemini call failed", e)
+    ai_response = ''.join(pieces)
+    if not ai_response:
+        ai_response = FALLBACK_RESPONSE
+        yield ai_response
+    conversation.add_assistant(ai_response)
+    chat_log = state['chat_log']
+    if chat_log.full():
+        # This log() writes to Mongo itself; keep that off the event loop
+        await asyncio.to_thread(chat_log.log, session.phone, user_input, ai_response)
+    else:
+        chat_log.log(session.phone, user_input, ai_response)
+    if is_logout(ai_response):
+        state['sessions'].pop(session.id, None)
+
+
+async def receive(websocket, model):
+    """The next message as `model`, or None after replying with an error."""
+    try:
+        return model.model_validate(await websocket.receive_json())
+    except ValueError:
+        await websocket.send_json({"error": f"Expected a JSON object with {', '.join(model.model_fields)}."})
+        return None
+
+
+async def get_response(session, user_input):
+    async with session.lock:
+        return ''.join([chunk async for chunk in iter_response(session, user_input)])
+
+
+@app.post("/users", status_code=201)
+async def register_user(registration: Registration):
+    if not is_valid_phone(registration.phone):
+        raise HTTPException(400, "Invalid phone number. Please enter a valid 10-digit phone number.")
+    if await state['users'].find_one({"phone": registration.phone}):
+        raise HTTPException(409, "This phone number is already registered.")
+    await state['users'].insert_one({
+        "phone": registration.phone,
+        "full_name": registration.full_name,
+        "language": [lang.strip() for lang in registration.language]
+    })
+    return {"phone": registration.phone}
+
+
+@app.post("/sessions", status_code=201)
+async def start_chat(login: Login):
+    session = await open_session(login.phone)
+    return {"session_id": session.id, "message": f"Hello {session.user_data['full_name']}! You can start chating now."}
+
+
+@app.post("/sessions/{session_id}/messages")
+async def send_message(session_id: str, message: Message):
+    session = get_session(session_id)
+    ai_response = await get_response(session, message.message)
+    return {"reply": ai_response, "logged_out": session_id not in state['sessions']}
+
+
+@app.delete("/sessions/{session_id}", status_code=204)
+async def end_chat(session_id: str):
+    get_session(session_id)
+    state['sessions'].pop(session_id, None)
+
+
+@app.websocket("/ws")
+async def chat_socket(websocket: WebSocket):
+    """Send {"phone": ...} first, then {"message": ...} per turn.
+
+    Each reply is streamed as {"chunk": ...} events followed by
+    {"done": true, "reply": ..., "logged_out": ...}.
+    """
+    await websocket.accept()
+    session = None
+    try:
+        login = await receive(websocket, Login)
+        if login is None:
+            await websocket.close()
+            return
+        try:
+            session = await open_session(login.phone)
+        except HTTPException as e:
+            await websocket.send_json({"error": e.detail})
+            await websocket.close()
+            return
+        await websocket.send_json({"session_id": session.id,
+                                   "message": f"Hello {session.user_data['full_name']}! You can start chating now."})
+        while session.id in state['sessions']:
+            message = await receive(websocket, Message)
+            if message is None:
+                continue
+            pieces = []
+            async with session.lock:
+                async for chunk in iter_response(session, message.message):
+                    pieces.append(chunk)
+                    await websocket.send_json({"chunk": chunk})
+            await websocket.send_json({"done": True, "reply": ''.join(pieces),
+                                       "logged_out": session.id not in state['sessions']})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if session is not None:
+            state['sessions'].pop(session.id, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Spotify assistant over HTTP and WebSocket")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == "__main__":
+    main()
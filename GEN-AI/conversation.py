@@ -0,0 +1,184 @@
+import asyncio
+import inspect
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from gemini_client import GeminiError, generate, log_error
+
+CONTEXT_TOKENS = int(os.environ.get('GEMINI_CONTEXT_TOKENS', 3000))
+SUMMARY_TOKENS = int(os.environ.get('GEMINI_SUMMARY_TOKENS', 300))
+
+SUMMARY_PROMPT = """Summarise this customer support conversation for the assistant that is handling it.
+Keep the user's name, what they asked for, what was already recommended or explained, and anything still unresolved.
+Answer in at most {words} words of plain text.
+
+Summary so far: {summary}
+
+New turns: {turns}"""
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text; close enough to
+    # budget a prompt without shipping a tokenizer
+    return len(text) // 4 + 1
+
+
+def render_entry(role, content):
+    return f"{role}: {content}"
+
+
+def summary_prompt(summary, entries, max_tokens):
+    return SUMMARY_PROMPT.format(words=max_tokens * 3 // 4, summary=summary or '(none)', turns=' '.join(entries))
+
+
+def summarize_with_gemini(summary, entries, max_tokens=SUMMARY_TOKENS):
+    return generate(summary_prompt(summary, entries, max_tokens)).strip()
+
+
+async def summarize_with_client(client, summary, entries, max_tokens=SUMMARY_TOKENS):
+    """summarize_with_gemini for an AsyncGeminiClient, sharing its concurrency limit."""
+    return (await client.generate(summary_prompt(summary, entries, max_tokens))).strip()
+
+
+_executor = {"pid": None, "executor": None}
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    pid = os.getpid()
+    if _executor["pid"] != pid:
+        with _executor_lock:
+            if _executor["pid"] != pid:
+                _executor["executor"] = ThreadPoolExecutor(max_workers=2, thread_name_prefix='summarizer')
+                _executor["pid"] = pid
+    return _executor["executor"]
+
+
+class Conversation:
+    """Token-budgeted prompt context for one chat.
+
+    The most recent turns are kept verbatim while they fit in `max_tokens`.
+    Older turns are folded into a running summary by `summarize(summary,
+    entries)` on a background thread, so a turn never waits for it. If
+    `summarize` is a coroutine function it runs on `loop` instead. Turns
+    whose summary is still being written stay in the prompt verbatim until it
+    lands, up to another `max_tokens`. Beyond that the oldest are dropped:
+    those already handed to the running summary still reach it, the rest are
+    forgotten. The rendered window is kept as one string and only appended to
+    or trimmed at the front, so building a prompt costs the same on turn 100
+    as on turn 2.
+
+    `history` keeps the full transcript as {"role", "content"} dicts.
+    """
+
+    def __init__(self, system_prompt, max_tokens=CONTEXT_TOKENS, summary_tokens=SUMMARY_TOKENS,
+                 summarize=summarize_with_gemini, loop=None):
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.summarize = summarize
+        self.loop = loop
+        self.history = []
+        self.summary = ''
+        self._window = deque()
+        self._window_text = ''
+        self._window_tokens = 0
+        # Evicted turns not yet folded into the summary
+        self._pending = deque()
+        self._pending_tokens = 0
+        # [entries still pending that the running summary covers, future]
+        self._summarizing = None
+        # Reentrant because a summary that is already done runs its callback
+        # straight from _start_summary
+        self._lock = threading.RLock()
+
+    def add(self, role, content):
+        self.history.append({"role": role, "content": content})
+        entry = render_entry(role, content)
+        tokens = estimate_tokens(entry)
+        with self._lock:
+            self._window.append((entry, tokens))
+            self._window_text = f"{self._window_text} {entry}" if self._window_text else entry
+            self._window_tokens += tokens
+            # Always keep the newest turn, however long it is
+            while self._window_tokens > self.max_tokens and len(self._window) > 1:
+                old_entry, old_tokens = self._window.popleft()
+                self._window_text = self._window_text[len(old_entry) + 1:]
+                self._window_tokens -= old_tokens
+                self._pending.append((old_entry, old_tokens))
+                self._pending_tokens += old_tokens
+            self._drop_unsummarized()
+            self._start_summary()
+
+    def add_user(self, content):
+        self.add("user", content)
+
+    def add_assistant(self, content):
+        self.add("assistant", content)
+
+    def _drop_unsummarized(self):
+        # If summaries are slow or keep failing, do not let the backlog grow
+        # the prompt without bound; the oldest turns are simply forgotten
+        while self._pending_tokens > self.max_tokens and len(self._pending) > 1:
+            _, tokens = self._pending.popleft()
+            self._pending_tokens -= tokens
+            if self._summarizing is not None and self._summarizing[0]:
+                self._summarizing[0] -= 1
+
+    def _start_summary(self):
+        if self._summarizing is not None or not self._pending or self.summarize is None:
+            return
+        entries = [entry for entry, _ in self._pending]
+        try:
+            if inspect.iscoroutinefunction(self.summarize):
+                future = asyncio.run_coroutine_threadsafe(
+                    self.summarize(self.summary, entries, self.summary_tokens), self.loop)
+            else:
+                future = get_executor().submit(self.summarize, self.summary, entries, self.summary_tokens)
+        except RuntimeError:
+            # The interpreter or the loop is shutting down
+            return
+        self._summarizing = [len(entries), future]
+        future.add_done_callback(self._summary_done)
+
+    def _summary_done(self, future):
+        with self._lock:
+            count = self._summarizing[0]
+            self._summarizing = None
+            try:
+                summary = future.result()
+            except (GeminiError, KeyError, IndexError, ValueError) as e:
+                log_error("Conversation summary failed, keeping the turns verbatim for now", e)
+                return
+            self.summary = summary[:self.summary_tokens * 4]
+            for _ in range(count):
+                _, tokens = self._pending.popleft()
+                self._pending_tokens -= tokens
+            self._start_summary()
+
+    def wait_for_summary(self):
+        while True:
+            with self._lock:
+                summarizing = self._summarizing
+            if summarizing is None:
+                return
+            summarizing[1].exception()
+
+    def prompt_text(self):
+        with self._lock:
+            parts = [self.system_prompt]
+            if self.summary:
+                parts.append(f"Summary of the earlier conversation: {self.summary}")
+            if self._pending:
+                pending = ' '.join(entry for entry, _ in self._pending)
+                parts.append(f"{pending} {self._window_text}" if self._window_text else pending)
+            else:
+                parts.append(self._window_text)
+        return '\n\n'.join(parts)
+
+    def prompt_tokens(self):
+        with self._lock:
+            return (estimate_tokens(self.system_prompt) + estimate_tokens(self.summary) + self._pending_tokens
+                    + self._window_tokens)
@@ -0,0 +1,359 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+GEMINI_BASE_URL = os.environ.get('GEMINI_BASE_URL', 'https://generativelanguage.googleapis.com/v1beta')
+GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-1.5-flash-latest')
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', 'API_KEY')
+# Streaming is on unless GEMINI_STREAM=0
+GEMINI_STREAM = os.environ.get('GEMINI_STREAM', '1') != '0'
+
+CONNECT_TIMEOUT = float(os.environ.get('GEMINI_CONNECT_TIMEOUT', 5))
+# For streamed replies this is the longest allowed gap between chunks
+READ_TIMEOUT = float(os.environ.get('GEMINI_READ_TIMEOUT', 60))
+MAX_RETRIES = int(os.environ.get('GEMINI_MAX_RETRIES', 3))
+BACKOFF = float(os.environ.get('GEMINI_BACKOFF', 0.5))
+MAX_BACKOFF = float(os.environ.get('GEMINI_MAX_BACKOFF', 8))
+POOL_SIZE = int(os.environ.get('GEMINI_POOL_SIZE', 10))
+BREAKER_FAILURES = int(os.environ.get('GEMINI_BREAKER_FAILURES', 5))
+BREAKER_RESET = float(os.environ.get('GEMINI_BREAKER_RESET', 30))
+# Requests in flight at once from one AsyncGeminiClient
+MAX_CONCURRENCY = int(os.environ.get('GEMINI_MAX_CONCURRENCY', 100))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+logger = logging.getLogger('gemini')
+
+
+class GeminiError(Exception):
+    pass
+
+
+class CircuitOpenError(GeminiError):
+    pass
+
+
+def model_url(method, **params):
+    # The key goes in a header, not the query string, so that it never shows
+    # up in a URL quoted by an exception
+    query = '&'.join(f"{name}={value}" for name, value in params.items())
+    url = f"{GEMINI_BASE_URL}/models/{GEMINI_MODEL}:{method}"
+    return f"{url}?{query}" if query else url
+
+
+def api_headers():
+    return {'x-goog-api-key': GEMINI_API_KEY}
+
+
+def redact(text):
+    """Hide the API key in text that is about to be logged or re-raised."""
+    text = str(text)
+    if GEMINI_API_KEY:
+        text = text.replace(GEMINI_API_KEY, '<redacted>')
+    return re.sub(r"([?&]key=)[^&\s'\"]+", r"\1<redacted>", text)
+
+
+def log_error(message, error):
+    # For the operator on stderr, never for the chat user
+    logger.warning("%s: %s", message, redact(error))
+
+
+def build_payload(prompt_text):
+    return {"contents": [{"parts": [{"text": prompt_text}]}]}
+
+
+class CircuitBreaker:
+    """Fails fast after `failure_threshold` consecutive failed calls.
+
+    Once open, calls are refused for `reset_timeout` seconds; after that one
+    trial call is let through, and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return 'open'
+        return 'half-open'
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == 'open' or (state == 'half-open' and self.trial_running):
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+                raise CircuitOpenError(f"Gemini is unavailable, not retrying for another {retry_in:.0f}s")
+            if state == 'half-open':
+                self.trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+breaker = CircuitBreaker()
+_session = {"pid": None, "session": None}
+_session_lock = threading.Lock()
+
+
+def get_session():
+    # One pooled keep-alive session per process; a session inherited across
+    # a fork would share its sockets with the parent
+    pid = os.getpid()
+    if _session["pid"] != pid:
+        with _session_lock:
+            if _session["pid"] != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session["session"] = session
+                _session["pid"] = pid
+    return _session["session"]
+
+
+def backoff_delay(attempt, retry_after=None):
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), MAX_BACKOFF)
+        except ValueError:
+            pass
+    # Full jitter keeps retrying clients from hitting the API in lockstep
+    return random.uniform(0, min(MAX_BACKOFF, BACKOFF * 2 ** attempt))
+
+
+def _post_with_retries(url, payload, stream):
+    error = None
+    for attempt in range(MAX_RETRIES + 1):
+        retry_after = None
+        try:
+            response = get_session().post(url, json=payload, headers=api_headers(), stream=stream, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = GeminiError(f"Gemini request failed: {redact(e)}")
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            error = GeminiError(f"Gemini returned HTTP {response.status_code}: {redact(response.text[:200])}")
+            retry_after = response.headers.get('Retry-After')
+            response.close()
+        if attempt < MAX_RETRIES:
+            time.sleep(backoff_delay(attempt, retry_after))
+    raise error
+
+
+def post(method, payload, stream=False, **params):
+    """POST to a model method, retrying connection errors, timeouts, 429 and 5xx.
+
+    Other 4xx responses are returned as they are: they mean the request was
+    wrong, not that Gemini is unhealthy.
+    """
+    breaker.before_call()
+    try:
+        response = _post_with_retries(model_url(method, **params), payload, stream)
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return response
+
+
+def parse_json(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        # e.g. an HTML error page from a proxy in front of the API
+        raise GeminiError(f"Gemini returned a body that is not JSON: {redact(text[:200])!r}") from None
+
+
+def extract_text(response_json):
+    # Streamed chunks can carry no parts (e.g. the final one with only
+    # finishReason), so missing text reads as ''
+    try:
+        parts = response_json['candidates'][0]['content']['parts']
+    except (KeyError, IndexError):
+        if 'error' in response_json:
+            raise GeminiError(redact(response_json['error'].get('message', 'Gemini returned an error')))
+        if response_json.get('candidates'):
+            return ''
+        # No candidates at all, typically because the prompt was blocked
+        reason = response_json.get('promptFeedback', {}).get('blockReason')
+        if reason:
+            raise GeminiError(f"Gemini blocked the prompt: {reason}") from None
+        raise GeminiError(f"Gemini returned no candidates: {redact(json.dumps(response_json)[:200])}") from None
+    return ''.join(part.get('text', '') for part in parts)
+
+
+def generate(prompt_text):
+    response = post('generateContent', build_payload(prompt_text))
+    return extract_text(parse_json(response.text))
+
+
+def iter_sse_events(lines):
+    data = []
+    for line in lines:
+        if line.startswith('data:'):
+            data.append(line[5:].lstrip())
+        elif not line and data:
+            yield '\n'.join(data)
+            data = []
+    if data:
+        yield '\n'.join(data)
+
+
+def stream_generate(prompt_text):
+    """Yield the reply text piece by piece as streamGenerateContent sends it."""
+    with post('streamGenerateContent', build_payload(prompt_text), stream=True, alt='sse') as response:
+        if response.status_code != 200:
+            try:
+                message = response.json()['error']['message']
+            except (ValueError, KeyError, TypeError):
+                message = response.text[:200]
+            raise GeminiError(f"Gemini returned HTTP {response.status_code}: {redact(message)}")
+        # SSE is UTF-8, but requests falls back to ISO-8859-1 without a charset
+        response.encoding = 'utf-8'
+        try:
+            for event in iter_sse_events(response.iter_lines(decode_unicode=True)):
+                text = extract_text(parse_json(event))
+                if text:
+                    yield text
+        except requests.RequestException as e:
+            # Retrying mid-reply would repeat text already shown to the user
+            breaker.record_failure()
+            raise GeminiError(f"Gemini stream was interrupted: {redact(e)}") from None
+
+
+def print_stream(chunks, prefix="Bot: ", out=sys.stdout):
+    """Print chunks as they arrive and return the assembled text."""
+    pieces = []
+    out.write(prefix)
+    out.flush()
+    try:
+        for chunk in chunks:
+            pieces.append(chunk)
+            out.write(chunk)
+            out.flush()
+    finally:
+        out.write("\n\n")
+        out.flush()
+    return ''.join(pieces)
+
+
+async def aiter_sse_events(lines):
+    data = []
+    async for line in lines:
+        if line.startswith('data:'):
+            data.append(line[5:].lstrip())
+        elif not line and data:
+            yield '\n'.join(data)
+            data = []
+    if data:
+        yield '\n'.join(data)
+
+
+class AsyncGeminiClient:
+    """asyncio version of generate() and stream_generate() for the chat server.
+
+    Uses one pooled httpx.AsyncClient with the same timeouts, retries and
+    circuit breaker as the blocking calls. At most `max_concurrency` requests
+    are in flight; further callers wait for a slot instead of piling more
+    connections onto the upstream.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY):
+        if httpx is None:
+            raise RuntimeError("httpx is not installed (pip install httpx)")
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _post_with_retries(self, url, payload, stream):
+        error = None
+        for attempt in range(MAX_RETRIES + 1):
+            retry_after = None
+            try:
+                response = await self.client.send(self.client.build_request('POST', url, json=payload, headers=api_headers()), stream=stream)
+            except httpx.TransportError as e:
+                error = GeminiError(f"Gemini request failed: {redact(repr(e))}")
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                body = await response.aread()
+                error = GeminiError(f"Gemini returned HTTP {response.status_code}: {redact(repr(body[:200]))}")
+                retry_after = response.headers.get('Retry-After')
+                await response.aclose()
+            if attempt < MAX_RETRIES:
+                await asyncio.sleep(backoff_delay(attempt, retry_after))
+        raise error
+
+    async def post(self, method, payload, stream=False, **params):
+        breaker.before_call()
+        try:
+            response = await self._post_with_retries(model_url(method, **params), payload, stream)
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        return response
+
+    async def generate(self, prompt_text):
+        async with self.semaphore:
+            response = await self.post('generateContent', build_payload(prompt_text))
+            return extract_text(parse_json(response.text))
+
+    async def stream_generate(self, prompt_text):
+        async with self.semaphore:
+            response = await self.post('streamGenerateContent', build_payload(prompt_text), stream=True, alt='sse')
+            try:
+                if response.status_code != 200:
+                    await response.aread()
+                    try:
+                        message = response.json()['error']['message']
+                    except (ValueError, KeyError, TypeError):
+                        message = response.text[:200]
+                    raise GeminiError(f"Gemini returned HTTP {response.status_code}: {redact(message)}")
+                try:
+                    async for event in aiter_sse_events(response.aiter_lines()):
+                        text = extract_text(parse_json(event))
+                        if text:
+                            yield text
+                except httpx.TransportError as e:
+                    breaker.record_failure()
+                    raise GeminiError(f"Gemini stream was interrupted: {redact(repr(e))}") from None
+            finally:
+                await response.aclose()
@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from pymongo import DeleteOne, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from chat_log import BUCKET_COLLECTION, BUCKET_TURNS, ensure_indexes
+
+MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017/')
+DB_NAME = 'spotify_bot'
+# Migrated turn buckets are numbered from here, below the live writer's
+# buckets (which start at 0), so they sort first and never collide with them
+MIGRATED_SEQ_START = -1000000
+
+_worker = {}
+
+
+def init_worker():
+    # Each process opens its own client; pymongo clients are not fork-safe
+    _worker['db'] = MongoClient(MONGO_URI)[DB_NAME]
+
+
+def parse_date(date_str):
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def daily_buckets(document):
+    # Merged in front of any turns the live writer has already added for the
+    # day. The `migrated` flag makes a second run match nothing; its upsert
+    # then hits the unique (phone, date) index and is counted as done.
+    for date_str, turns in sorted(document.get('chat', {}).items()):
+        day = parse_date(date_str)
+        yield UpdateOne(
+            {"phone": document['phone'], "date": date_str, "migrated": {"$ne": True}},
+            {"$push": {"turns": {"$each": turns, "$position": 0}}, "$inc": {"count": len(turns)},
+             "$set": {"migrated": True}, "$min": {"start": day}, "$max": {"end": day}},
+            upsert=True
+        )
+
+
+def turn_buckets(document, bucket_turns):
+    turns = [(parse_date(date_str), turn)
+             for date_str, day_turns in sorted(document.get('chat', {}).items()) for turn in day_turns]
+    for number, start in enumerate(range(0, len(turns), bucket_turns)):
+        bucket = turns[start:start + bucket_turns]
+        # Insert-only, so a second run leaves existing buckets, and anything
+        # the live writer appended to them, alone
+        yield UpdateOne(
+            {"phone": document['phone'], "seq": MIGRATED_SEQ_START + number},
+            {"$setOnInsert": {"turns": [turn for _, turn in bucket], "count": len(bucket),
+                              "start": bucket[0][0], "end": bucket[-1][0], "migrated": True}},
+            upsert=True
+        )
+
+
+def write_buckets(collection, operations):
+    """Returns (buckets written, buckets already migrated)."""
+    try:
+        result = collection.bulk_write(operations, ordered=False).bulk_api_result
+    except BulkWriteError as e:
+        result = e.details
+        if any(error['code'] != 11000 for error in result['writeErrors']):
+            raise
+    written = result['nUpserted'] + result['nModified']
+    return written, len(operations) - written
+
+
+def migrate_batch(ids, schema, bucket_turns, delete_source):
+    db = _worker['db']
+    documents, operations, deletes, turns = 0, [], [], 0
+    for document in db['chat'].find({"_id": {"$in": ids}}):
+        if 'phone' not in document:
+            continue
+        documents += 1
+        turns += sum(len(day_turns) for day_turns in document.get('chat', {}).values())
+        operations.extend(daily_buckets(document) if schema == 'daily' else turn_buckets(document, bucket_turns))
+        # Only deleted if nothing was appended to it since it was read
+        deletes.append(DeleteOne({"_id": document['_id'], "chat": document.get('chat')}))
+    written, skipped = write_buckets(db[BUCKET_COLLECTION], operations) if operations else (0, 0)
+    deleted = db['chat'].bulk_write(deletes, ordered=False).deleted_count if delete_source and deletes else 0
+    return {"documents": documents, "buckets": written, "already_migrated": skipped, "turns": turns,
+            "deleted": deleted, "kept": documents - deleted if delete_source else 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rewrite the one-document-per-phone chat history into chat_buckets documents")
+    parser.add_argument('--schema', choices=['daily', 'turns'], default='daily',
+                        help="one bucket per phone per day, or per --bucket-turns turns")
+    parser.add_argument('--bucket-turns', type=int, default=BUCKET_TURNS)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=200, help="chat documents per task")
+    parser.add_argument('--delete-source', action='store_true',
+                        help="delete each chat document once its buckets are written, unless it changed meanwhile")
+    args = parser.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    db = client[DB_NAME]
+    ensure_indexes(db[BUCKET_COLLECTION], args.schema)
+    ids = [document['_id'] for document in db['chat'].find({}, {"_id": 1})]
+    client.close()
+
+    start = time.perf_counter()
+    totals = dict.fromkeys(['documents', 'buckets', 'already_migrated', 'turns', 'deleted', 'kept'], 0)
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as executor:
+        futures = [
+            executor.submit(migrate_batch, ids[i:i + args.batch_size], args.schema, args.bucket_turns,
+                            args.delete_source)
+            for i in range(0, len(ids), args.batch_size)
+        ]
+        for future in as_completed(futures):
+            for name, value in future.result().items():
+                totals[name] += value
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps(dict(
+        totals,
+        schema=args.schema,
+        workers=args.workers,
+        elapsed_sec=round(elapsed, 3),
+        docs_per_sec=round(totals['documents'] / elapsed, 1) if elapsed else 0.0,
+    ), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import os
+import threading
+from collections import Counter, OrderedDict
+
+from pymongo.errors import PyMongoError
+
+from spotify_assistant import build_system_prompt, shape_recommendations, trim_recommendations
+
+# Seconds between catalogue reloads when change streams are unavailable
+# (a standalone mongod has none)
+CATALOGUE_REFRESH = float(os.environ.get('RECOMMENDATION_REFRESH', 60))
+PROMPT_CACHE_SIZE = int(os.environ.get('PROMPT_CACHE_SIZE', 10000))
+# Playlists kept per language the user did not list; 0 drops those languages
+OTHER_LANGUAGE_LINKS = int(os.environ.get('PROMPT_OTHER_LANGUAGE_LINKS', 1))
+
+
+class RecommendationCatalogue:
+    """The shared `recommendation` document, loaded once per process.
+
+    A background thread reloads it whenever a change stream reports a write
+    to the collection, or every `refresh` seconds if the server does not
+    support change streams. The version returned by get() goes up each time
+    the content actually changes, so prompts rendered from an older copy can
+    be spotted.
+    `collection` is a blocking pymongo collection.
+    """
+
+    def __init__(self, collection, refresh=CATALOGUE_REFRESH, watch=True):
+        self.collection = collection
+        self.refresh = refresh
+        self.watch = watch
+        self._snapshot = (0, None)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def get(self):
+        """Return (version, recommendation data)."""
+        self._ensure_refreshing()
+        if self._snapshot[1] is None:
+            self.reload()
+        return self._snapshot
+
+    def reload(self):
+        data = shape_recommendations(self.collection.find_one())
+        with self._lock:
+            version, current = self._snapshot
+            if data != current:
+                self._snapshot = (version + 1, data)
+
+    def _ensure_refreshing(self):
+        # Threads do not survive a fork, so a forked worker starts its own
+        # refresher on first use
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='recommendation-refresh', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        if self.watch:
+            try:
+                self._watch()
+            except PyMongoError as e:
+                if not self._stopped.is_set():
+                    print(f"Recommendation change stream unavailable, reloading every {self.refresh:.0f}s: {e}")
+        while not self._stopped.wait(self.refresh):
+            try:
+                self.reload()
+            except PyMongoError as e:
+                print(f"Could not reload recommendations, keeping the current copy: {e}")
+
+    def _watch(self):
+        with self.collection.watch(max_await_time_ms=1000) as stream:
+            # Anything written before the stream opened was missed
+            self.reload()
+            while not self._stopped.is_set():
+                if stream.try_next() is not None:
+                    self.reload()
+
+    def close(self):
+        self._stopped.set()
+
+
+class PromptCache:
+    """Rendered system prompts by phone number.
+
+    An entry is reused while the user's name and languages and the
+    catalogue version match the ones it was rendered from, so changing a
+    user's languages or the catalogue re-renders it on the next login. The
+    embedded catalogue is trimmed to the user's languages (see
+    trim_recommendations). Least recently used entries beyond `max_entries`
+    are dropped.
+    """
+
+    def __init__(self, catalogue, max_entries=PROMPT_CACHE_SIZE, other_language_links=OTHER_LANGUAGE_LINKS):
+        self.catalogue = catalogue
+        self.max_entries = max_entries
+        self.other_language_links = other_language_links
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def get(self, user_data):
+        version, recommendation_data = self.catalogue.get()
+        key = (version, user_data['full_name'], tuple(user_data['language']))
+        phone = user_data['phone']
+        with self._lock:
+            entry = self._entries.get(phone)
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(phone)
+                self.stats['hits'] += 1
+                return entry[1]
+        trimmed = trim_recommendations(recommendation_data, user_data['language'], self.other_language_links)
+        system_prompt = build_system_prompt(user_data, trimmed)
+        with self._lock:
+            self.stats['misses'] += 1
+            self._entries[phone] = (key, system_prompt)
+            self._entries.move_to_end(phone)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return system_prompt
+
+    def invalidate(self, phone):
+        with self._lock:
+            self._entries.pop(phone, None)
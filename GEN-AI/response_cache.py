@@ -0,0 +1,196 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+import redis
+
+CACHE_ENABLED = os.environ.get('GEMINI_CACHE', '1') != '0'
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+CACHE_TTL = int(os.environ.get('GEMINI_CACHE_TTL', 24 * 3600))
+# History entries before the user's message that are part of the cache key
+CONTEXT_ENTRIES = int(os.environ.get('GEMINI_CACHE_CONTEXT_ENTRIES', 2))
+# 0 turns the near-duplicate tier off
+SIMILARITY_THRESHOLD = float(os.environ.get('GEMINI_CACHE_SIMILARITY', 0.85))
+
+KEY_PREFIX = 'gemini:response'
+# After a Redis error the cache stays off for this long instead of adding a
+# failed round trip to every turn
+REDIS_RETRY_AFTER = 30.0
+
+
+def normalize(text):
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return ' '.join(text.split())
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+# Left out of similarity so that phrasing does not outweigh the topic
+STOPWORDS = {
+    'a', 'an', 'the', 'i', 'me', 'my', 'you', 'your', 'we', 'it', 'is', 'am', 'are', 'be', 'do', 'does', 'can',
+    'could', 'would', 'will', 'should', 'how', 'what', 'to', 'of', 'in', 'on', 'for', 'with', 'and', 'or', 'please',
+    'hi', 'hello', 'hey', 'want', 'need', 'like', 'help', 'get',
+}
+
+
+def _terms(text):
+    words = [word for word in text.split() if word not in STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class NearDuplicateIndex:
+    """TF-IDF cosine similarity over a bounded set of short questions."""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.docs = OrderedDict()
+        self.postings = defaultdict(set)
+
+    def add(self, doc_id, text):
+        self.remove(doc_id)
+        self.docs[doc_id] = Counter(_terms(text))
+        for term in self.docs[doc_id]:
+            self.postings[term].add(doc_id)
+        while len(self.docs) > self.max_entries:
+            self.remove(next(iter(self.docs)))
+
+    def remove(self, doc_id):
+        terms = self.docs.pop(doc_id, None)
+        for term in terms or ():
+            self.postings[term].discard(doc_id)
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def _idf(self, term):
+        return math.log((1 + len(self.docs)) / (1 + len(self.postings.get(term, ())))) + 1
+
+    def _norm(self, counts):
+        return math.sqrt(sum((count * self._idf(term)) ** 2 for term, count in counts.items()))
+
+    def best_match(self, text):
+        query = Counter(_terms(text))
+        candidates = set()
+        for term in query:
+            candidates |= self.postings.get(term, set())
+        query_norm = self._norm(query)
+        best_id, best_score = None, 0.0
+        for doc_id in candidates:
+            doc = self.docs[doc_id]
+            dot = sum(count * doc[term] * self._idf(term) ** 2 for term, count in query.items() if term in doc)
+            score = dot / (query_norm * self._norm(doc)) if query_norm else 0.0
+            if score > best_score:
+                best_id, best_score = doc_id, score
+        if best_id is not None:
+            self.docs.move_to_end(best_id)
+        return best_id, best_score
+
+
+class ResponseCache:
+    """Cache of model replies for repeated questions.
+
+    Entries are keyed on the system prompt, the last `context_entries`
+    history entries and the user's message, all normalised, and stored in
+    Redis for `ttl` seconds so every bot process shares them. With a
+    `similarity_threshold`, a miss also checks a local TF-IDF index of the
+    questions answered under the same system prompt and context, and reuses
+    the reply of one that is similar enough. Callers with personalised
+    prompts pass `bypass=True`.
+    """
+
+    def __init__(self, redis_conn=None, ttl=CACHE_TTL, context_entries=CONTEXT_ENTRIES,
+                 similarity_threshold=SIMILARITY_THRESHOLD, max_scopes=256, max_entries_per_scope=1000):
+        self.redis_conn = redis_conn if redis_conn is not None else redis.Redis.from_url(
+            REDIS_URL, decode_responses=True, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.ttl = ttl
+        self.context_entries = context_entries
+        self.similarity_threshold = similarity_threshold
+        self.max_scopes = max_scopes
+        self.max_entries_per_scope = max_entries_per_scope
+        self._scopes = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis_down_until = 0.0
+        self.stats = Counter()
+
+    def context(self, history):
+        """The part of `history` that goes into the key; take it before adding the user's message."""
+        return history[-self.context_entries:] if self.context_entries else []
+
+    def _scope(self, system_prompt, context):
+        rendered = ' '.join(f"{entry['role']}: {normalize(entry['content'])}" for entry in context)
+        return f"{_digest(system_prompt)[:16]}:{_digest(rendered)[:16]}"
+
+    def _key(self, scope, question):
+        return f"{KEY_PREFIX}:{scope}:{_digest(question)[:32]}"
+
+    def _index(self, scope, create=False):
+        with self._lock:
+            index = self._scopes.get(scope)
+            if index is None and create:
+                index = self._scopes[scope] = NearDuplicateIndex(self.max_entries_per_scope)
+                while len(self._scopes) > self.max_scopes:
+                    self._scopes.popitem(last=False)
+            if index is not None:
+                self._scopes.move_to_end(scope)
+            return index
+
+    def _redis(self, method, *args, **kwargs):
+        if time.monotonic() < self._redis_down_until:
+            return None
+        try:
+            return getattr(self.redis_conn, method)(*args, **kwargs)
+        except redis.RedisError as e:
+            self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+            self.stats['errors'] += 1
+            print(f"Response cache unavailable for {REDIS_RETRY_AFTER:.0f}s: {e}")
+            return None
+
+    def get(self, system_prompt, context, user_input, bypass=False):
+        """Return (reply, 'exact' | 'similar') or (None, None)."""
+        if bypass:
+            self.stats['bypassed'] += 1
+            return None, None
+        question = normalize(user_input)
+        scope = self._scope(system_prompt, context)
+        cached = self._redis('get', self._key(scope, question))
+        if cached is not None:
+            self.stats['exact_hits'] += 1
+            if self.similarity_threshold:
+                # Questions first answered by another process join the local index
+                index = self._index(scope, create=True)
+                with self._lock:
+                    index.add(question, question)
+            return json.loads(cached)['reply'], 'exact'
+
+        index = self._index(scope) if self.similarity_threshold else None
+        if index is not None:
+            with self._lock:
+                match, score = index.best_match(question)
+            if match is not None and score >= self.similarity_threshold:
+                cached = self._redis('get', self._key(scope, match))
+                if cached is not None:
+                    self.stats['similar_hits'] += 1
+                    return json.loads(cached)['reply'], 'similar'
+                # Expired or evicted in Redis
+                with self._lock:
+                    index.remove(match)
+        self.stats['misses'] += 1
+        return None, None
+
+    def put(self, system_prompt, context, user_input, reply, bypass=False):
+        if bypass or not reply:
+            return
+        question = normalize(user_input)
+        scope = self._scope(system_prompt, context)
+        stored = self._redis('set', self._key(scope, question), json.dumps({'question': question, 'reply': reply}),
+                             ex=self.ttl)
+        if stored and self.similarity_threshold:
+            index = self._index(scope, create=True)
+            with self._lock:
+                index.add(question, question)
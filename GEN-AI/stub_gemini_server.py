@@ -0,0 +1,96 @@
+import argparse
+import json
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the Gemini generateContent and streamGenerateContent
+# endpoints. Point the bots at it with
+#   GEMINI_BASE_URL=http://127.0.0.1:8089/v1beta
+
+
+def reply_for(prompt_text):
+    last_line = prompt_text.strip().rsplit('user:', 1)[-1].strip()
+    if re.search(r'\bbye\b', last_line, re.IGNORECASE):
+        return "bye bye!"
+    return f"This is the stub assistant answering: {last_line}. Is there anything else I can help you with?"
+
+
+def chunk_json(text, finish=False):
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if finish:
+        candidate["finishReason"] = "STOP"
+    return {"candidates": [candidate]}
+
+
+class StubGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    first_token_delay = 0.2
+    chunk_delay = 0.05
+    words_per_chunk = 3
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        try:
+            prompt_text = body['contents'][0]['parts'][0]['text']
+        except (KeyError, IndexError):
+            self._send_json(400, {"error": {"code": 400, "message": "contents[0].parts[0].text is required"}})
+            return
+        text = reply_for(prompt_text)
+        path = self.path.split('?', 1)[0]
+
+        if path.endswith(':generateContent'):
+            time.sleep(self.first_token_delay + self.chunk_delay * (len(text.split()) // self.words_per_chunk))
+            self._send_json(200, chunk_json(text, finish=True))
+        elif path.endswith(':streamGenerateContent'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            words = text.split(' ')
+            time.sleep(self.first_token_delay)
+            for start in range(0, len(words), self.words_per_chunk):
+                piece = ' '.join(words[start:start + self.words_per_chunk])
+                if start:
+                    piece = ' ' + piece
+                last = start + self.words_per_chunk >= len(words)
+                self._write_chunk(f"data: {json.dumps(chunk_json(piece, finish=last))}\r\n\r\n".encode('utf-8'))
+                if not last:
+                    time.sleep(self.chunk_delay)
+            self._write_chunk(b'')
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": f"Unknown method {path}"}})
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Gemini API server for local testing")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--first-token-delay', type=float, default=StubGeminiHandler.first_token_delay)
+    parser.add_argument('--chunk-delay', type=float, default=StubGeminiHandler.chunk_delay)
+    options = parser.parse_args()
+
+    StubGeminiHandler.first_token_delay = options.first_token_delay
+    StubGeminiHandler.chunk_delay = options.chunk_delay
+    server = ThreadingHTTPServer((options.host, options.port), StubGeminiHandler)
+    print(f"Stub Gemini server listening on http://{options.host}:{options.port}/v1beta")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import random
+import string
+import time
+
+from serializers import DEFAULT_COMPRESS_THRESHOLD, SERIALIZER_NAMES, get_serializer
+
+
+def random_text(rng, words):
+    return ' '.join(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 9)))
+                    for _ in range(words))
+
+
+def build_payloads(seed=42):
+    rng = random.Random(seed)
+    session = {'user': 'alice', 'logged_in': True, 'cart_items': 3, 'last_seen': 1718000000.5}
+    profile = {
+        'id': 1042,
+        'name': 'Alice Example',
+        'email': 'alice@example.com',
+        'languages': ['Python', 'Go', 'SQL'],
+        'scores': [rng.random() for _ in range(20)],
+        'address': {'city': 'Bengaluru', 'zip': '560001'},
+    }
+    records = [
+        {'id': i, 'name': random_text(rng, 2), 'position': random_text(rng, 3), 'active': i % 3 != 0,
+         'salary': rng.randint(30000, 150000)}
+        for i in range(500)
+    ]
+    chat_history = {
+        'username': 'alice',
+        'turns': [{'user_query': random_text(rng, 12), 'bot_response': random_text(rng, 60)} for _ in range(200)],
+    }
+    return {
+        'session (small dict)': session,
+        'profile (nested)': profile,
+        'records (500 rows)': records,
+        'chat history (text)': chat_history,
+    }
+
+
+def time_per_call(func, arg, budget_seconds):
+    rounds = 0
+    start = time.perf_counter()
+    while True:
+        func(arg)
+        rounds += 1
+        elapsed = time.perf_counter() - start
+        if elapsed > budget_seconds:
+            return elapsed / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serializer throughput and stored size benchmark")
+    parser.add_argument('--threshold', type=int, default=DEFAULT_COMPRESS_THRESHOLD,
+                        help="Compression threshold in bytes")
+    parser.add_argument('--budget', type=float, default=0.3, help="Seconds spent timing each measurement")
+    options = parser.parse_args()
+
+    serializers = []
+    for name in SERIALIZER_NAMES:
+        try:
+            serializers.append(get_serializer(name, options.threshold))
+        except RuntimeError as e:
+            print(f"Skipping {name}: {e}")
+
+    print(f"{'payload':<22} {'serializer':<14} {'bytes':>9} {'ratio':>7} {'encode MB/s':>12} {'decode MB/s':>12}")
+    for label, payload in build_payloads().items():
+        json_size = len(get_serializer('json').dumps(payload))
+        for serializer in serializers:
+            data = serializer.dumps(payload)
+            assert serializer.loads(data) == payload
+            encode = time_per_call(serializer.dumps, payload, options.budget)
+            decode = time_per_call(serializer.loads, data, options.budget)
+            # Throughput is measured against the uncompressed JSON size so the
+            # serializers are compared on the same amount of logical data
+            print(f"{label:<22} {serializer.name:<14} {len(data):>9} {len(data) / json_size:>7.2f} "
+                  f"{json_size / encode / 1e6:>12.1f} {json_size / decode / 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+
+INVALIDATE_CHANNEL = 'cache:invalidate'
+# Marks a cached "key does not exist / is not a hash" answer
+MISSING = object()
+# Recent invalidations remembered per key; older ones are folded into a floor
+INVALIDATED_KEYS = 10000
+
+
+def _approx_size(value):
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class LocalCache:
+    """In-process LRU/TTL read-through cache in front of a RedisClient.
+
+    Reads are answered from a bounded local map when possible and fall back to
+    `client` (a RedisClient) on a miss. Missing keys are cached too, for
+    `negative_ttl` seconds, so repeated lookups of absent keys stay local.
+
+    Writes made through this cache go to Redis and then publish the key on
+    `channel`. Every LocalCache listening on that channel, in any process,
+    drops its copy. With `keyspace_events=True` it also listens to Redis
+    keyspace notifications, which catches writes made by other clients but
+    needs `notify-keyspace-events` to include `K` and the relevant classes on
+    the server. Whatever the invalidation source, no entry is served for longer
+    than `ttl` seconds after it was read from Redis.
+    """
+
+    def __init__(self, client, max_entries=10000, max_bytes=64 * 1024 * 1024, ttl=30.0, negative_ttl=5.0,
+                 channel=INVALIDATE_CHANNEL, keyspace_events=False, listen=True):
+        self.client = client
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.channel = channel
+        self.keyspace_events = keyspace_events
+        self.listen = listen
+        # key -> (kind, value, expires_at, size)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Bumped on every invalidation. A read remembers the generation it
+        # started at and does not store what it fetched if its key (or the
+        # whole cache) was invalidated since, so a read that raced with an
+        # invalidation does not put the old value back
+        self._generation = 0
+        # key -> generation of its last invalidation, for the most recent keys
+        self._invalidated = OrderedDict()
+        # Reads that started before this generation are never stored
+        self._floor = 0
+        self._counters = dict.fromkeys(
+            ('hits', 'misses', 'negative_hits', 'evictions', 'expirations', 'invalidations'), 0)
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    # Local map
+
+    def _lookup(self, kind, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != kind:
+                self._counters['misses'] += 1
+                return None, self._generation
+            if entry[2] <= time.monotonic():
+                self._remove(key)
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return None, self._generation
+            self._entries.move_to_end(key)
+            self._counters['negative_hits' if entry[1] is MISSING else 'hits'] += 1
+            return entry, self._generation
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[3]
+        return entry
+
+    def _store(self, kind, key, value, generation, ttl=None):
+        ttl = (self.negative_ttl if value is MISSING else self.ttl) if ttl is None else ttl
+        if ttl <= 0:
+            return
+        size = 0 if value is MISSING else _approx_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation < self._floor or self._invalidated.get(key, 0) > generation:
+                return
+            self._remove(key)
+            self._entries[key] = (kind, value, time.monotonic() + ttl, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._counters['evictions'] += 1
+
+    def _read(self, kind, key, fetch):
+        self._ensure_listening()
+        entry, generation = self._lookup(kind, key)
+        if entry is not None:
+            return entry[1]
+        value = fetch()
+        self._store(kind, key, MISSING if value is None else value, generation)
+        return MISSING if value is None else value
+
+    def invalidate(self, key, publish=True):
+        with self._lock:
+            self._generation += 1
+            self._invalidated[key] = self._generation
+            self._invalidated.move_to_end(key)
+            while len(self._invalidated) > INVALIDATED_KEYS:
+                _, generation = self._invalidated.popitem(last=False)
+                self._floor = max(self._floor, generation)
+            if self._remove(key) is not None:
+                self._counters['invalidations'] += 1
+        if publish:
+            self.client.redis_conn.publish(self.channel, key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._floor = self._generation
+            self._invalidated.clear()
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters, entries=len(self._entries), bytes=self._bytes)
+        lookups = stats['hits'] + stats['negative_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['negative_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    # Invalidation listener
+
+    def _ensure_listening(self):
+        # Threads do not survive a fork, so a forked worker starts its own
+        # listener on first use
+        if not self.listen or (self._thread is not None and self._pid == os.getpid()):
+            return
+        self._pid = os.getpid()
+        self._stopped.clear()
+        self.clear()
+        self._thread = threading.Thread(target=self._run, name='local-cache-invalidation', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        db = self.client.redis_conn.connection_pool.connection_kwargs.get('db', 0)
+        keyspace_prefix = f'__keyspace@{db}__:'
+        while not self._stopped.is_set():
+            pubsub = self.client.redis_conn.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                if self.keyspace_events:
+                    pubsub.psubscribe(f'{keyspace_prefix}*')
+                # Anything published while we were not subscribed was missed
+                self.clear()
+                while not self._stopped.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    channel = message['channel']
+                    key = channel[len(keyspace_prefix):] if message['type'] == 'pmessage' else message['data']
+                    self.invalidate(key, publish=False)
+            except (redis.ConnectionError, redis.TimeoutError) as e:
+                print(f"Local cache invalidation listener lost its connection, retrying: {e}")
+                self._stopped.wait(1.0)
+            finally:
+                pubsub.close()
+
+    def close(self):
+        self._stopped.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
+
+    # RedisClient methods
+
+    def redis_get_value(self, key):
+        value = self._read('string', key, lambda: self.client.redis_get_value(key))
+        return None if value is MISSING else value
+
+    def redis_get_dict_value(self, key):
+        def fetch():
+            try:
+                return self.client.redis_get_dict_value(key)
+            except TypeError:
+                return None
+
+        value = self._read('hash', key, fetch)
+        if value is MISSING:
+            raise TypeError(f"Key '{key}' is not of type hash")
+        return dict(value)
+
+    def redis_set_value(self, key, value):
+        result = self.client.redis_set_value(key, value)
+        self.invalidate(key)
+        return result
+
+    def redis_set_dict_value(self, key, value):
+        result = self.client.redis_set_dict_value(key, value)
+        self.invalidate(key)
+        return result
+
+    def redis_set_value_and_expiry(self, key, value, expiry):
+        result = self.client.redis_set_value_and_expiry(key, value, expiry)
+        self.invalidate(key)
+        return result
+
+    def redis_set_dict_value_and_expiry(self, key, value, expiry):
+        result = self.client.redis_set_dict_value_and_expiry(key, value, expiry)
+        self.invalidate(key)
+        return result
+
+    def redis_delete_value(self, key):
+        result = self.client.redis_delete_value(key)
+        self.invalidate(key)
+        return result
@@ -1,8 +1,93 @@
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+
 import redis
+import redis.asyncio
+from redis.client import NEVER_DECODE
+
+from serializers import get_serializer
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Hash writes: a key holding another type is replaced, an existing hash is
+# merged into, and the optional expiry is applied, all in one atomic call.
+# ARGV[1] is the expiry in seconds ('' for none), the rest are field/value
+# pairs. HSET is issued in slices to stay under Lua's unpack() limit.
+SET_DICT_SCRIPT = """
+local key = KEYS[1]
+if #ARGV > 1 and redis.call('TYPE', key).ok ~= 'hash' then
+    redis.call('DEL', key)
+end
+local added = 0
+for i = 2, #ARGV, 1000 do
+    added = added + redis.call('HSET', key, unpack(ARGV, i, math.min(i + 999, #ARGV)))
+end
+local expired = 0
+if ARGV[1] ~= '' then
+    expired = redis.call('EXPIRE', key, ARGV[1])
+end
+return {added, expired}
+"""
+
+# Returns {type} for non-hash keys so the caller can raise, or
+# {'hash', field/value pairs}
+GET_DICT_SCRIPT = """
+local key_type = redis.call('TYPE', KEYS[1]).ok
+if key_type ~= 'hash' then
+    return {key_type}
+end
+return {key_type, redis.call('HGETALL', KEYS[1])}
+"""
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def as_items(items):
+    return list(items.items()) if isinstance(items, dict) else list(items)
+
+
+# `expiry` in the batch operations is either a number of seconds for every
+# key or a {key: seconds} dict; keys missing from the dict get no expiry
+def expiry_for(key, expiry):
+    if isinstance(expiry, dict):
+        return expiry.get(key)
+    return expiry
+
+
+def set_dict_args(value, expiry=None):
+    args = ['' if expiry is None else int(expiry)]
+    for field, field_value in value.items():
+        args.extend((field, field_value))
+    return args
+
+
+def dict_reply(reply):
+    if reply[0] != 'hash':
+        return None
+    pairs = reply[1]
+    return dict(zip(pairs[::2], pairs[1::2]))
+
 
 class RedisClient:
-    def __init__(self, host='localhost', port=6379, db=0):
+    def __init__(self, host='localhost', port=6379, db=0, batch_size=DEFAULT_BATCH_SIZE, serializer='json'):
         self.redis_conn = redis.StrictRedis(host=host, port=port, db=db, decode_responses=True)
+        self.serializer = get_serializer(serializer) if isinstance(serializer, str) else serializer
+        self.batch_size = batch_size
+        self.set_dict_script = self.redis_conn.register_script(SET_DICT_SCRIPT)
+        self.get_dict_script = self.redis_conn.register_script(GET_DICT_SCRIPT)
+
+    def _set_dict(self, key, value, expiry=None, client=None):
+        return self.set_dict_script(keys=[key], args=set_dict_args(value, expiry), client=client)
+
+    def _get_dict(self, key, client=None):
+        return self.get_dict_script(keys=[key], client=client)
 
     def redis_set_value(self, key, value):
         return self.redis_conn.set(key, value)
@@ -13,14 +98,13 @@ class RedisClient:
     def redis_set_dict_value(self, key, value):
         if not isinstance(value, dict):
             raise ValueError("Value must be a dictionary")
-        if self.redis_conn.type(key) != 'hash':
-            self.redis_conn.delete(key)
-        return self.redis_conn.hset(key, mapping=value)
+        return self._set_dict(key, value)[0]
 
     def redis_get_dict_value(self, key):
-        if self.redis_conn.type(key) != 'hash':
+        value = dict_reply(self._get_dict(key))
+        if value is None:
             raise TypeError(f"Key '{key}' is not of type hash")
-        return self.redis_conn.hgetall(key)
+        return value
 
     def redis_set_value_and_expiry(self, key, value, expiry):
         return self.redis_conn.setex(key, expiry, value)
@@ -28,16 +112,228 @@ class RedisClient:
     def redis_set_dict_value_and_expiry(self, key, value, expiry):
         if not isinstance(value, dict):
             raise ValueError("Value must be a dictionary")
-        if self.redis_conn.type(key) != 'hash':
-            self.redis_conn.delete(key)
-        pipeline = self.redis_conn.pipeline()
-        pipeline.hset(key, mapping=value)
-        pipeline.expire(key, expiry)
-        return pipeline.execute()
+        added, expired = self._set_dict(key, value, expiry)
+        return [added, bool(expired)]
 
     def redis_delete_value(self, key):
         return self.redis_conn.delete(key)
 
+    # Structured values, stored as one string encoded by `serializer`.
+    # Serialized objects are bytes, so they are read back with NEVER_DECODE
+    # over the same connections rather than through a second, raw pool.
+
+    def redis_set_object(self, key, value, expiry=None):
+        return self.redis_conn.set(key, self.serializer.dumps(value), ex=expiry)
+
+    def redis_get_object(self, key):
+        data = self.redis_conn.execute_command('GET', key, **{NEVER_DECODE: True})
+        return None if data is None else self.serializer.loads(data)
+
+    # Batch operations. Keys are sent in chunks of `batch_size`, one round trip
+    # per chunk, and results come back in input order.
+
+    def set_many(self, items, expiry=None):
+        items = as_items(items)
+        results = []
+        for chunk in chunked(items, self.batch_size):
+            if expiry is None:
+                results.extend([self.redis_conn.mset(dict(chunk))] * len(chunk))
+                continue
+            pipeline = self.redis_conn.pipeline(transaction=False)
+            for key, value in chunk:
+                pipeline.set(key, value, ex=expiry_for(key, expiry))
+            results.extend(pipeline.execute())
+        return results
+
+    def get_many(self, keys):
+        keys = list(keys)
+        results = []
+        for chunk in chunked(keys, self.batch_size):
+            results.extend(self.redis_conn.mget(chunk))
+        return results
+
+    def set_dict_many(self, items, expiry=None):
+        items = as_items(items)
+        for _, value in items:
+            if not isinstance(value, dict):
+                raise ValueError("Value must be a dictionary")
+
+        results = []
+        for chunk in chunked(items, self.batch_size):
+            pipeline = self.redis_conn.pipeline(transaction=False)
+            for key, value in chunk:
+                self._set_dict(key, value, expiry_for(key, expiry), client=pipeline)
+            results.extend(reply[0] for reply in pipeline.execute())
+        return results
+
+    def get_dict_many(self, keys):
+        # Missing keys and keys that are not hashes come back as None rather
+        # than raising, so one bad key does not fail the whole batch
+        keys = list(keys)
+        results = []
+        for chunk in chunked(keys, self.batch_size):
+            pipeline = self.redis_conn.pipeline(transaction=False)
+            for key in chunk:
+                self._get_dict(key, client=pipeline)
+            results.extend(dict_reply(reply) for reply in pipeline.execute())
+        return results
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        return sum(self.redis_conn.delete(*chunk) for chunk in chunked(keys, self.batch_size))
+
+    def set_object_many(self, items, expiry=None):
+        items = as_items(items)
+        results = []
+        for chunk in chunked(items, self.batch_size):
+            pipeline = self.redis_conn.pipeline(transaction=False)
+            for key, value in chunk:
+                pipeline.set(key, self.serializer.dumps(value), ex=expiry_for(key, expiry))
+            results.extend(pipeline.execute())
+        return results
+
+    def get_object_many(self, keys):
+        keys = list(keys)
+        results = []
+        for chunk in chunked(keys, self.batch_size):
+            chunk_data = self.redis_conn.execute_command('MGET', *chunk, **{NEVER_DECODE: True})
+            results.extend(None if data is None else self.serializer.loads(data) for data in chunk_data)
+        return results
+
+
+
+class AsyncRedisClient:
+    """asyncio counterpart of RedisClient with the same methods, awaited.
+
+    Connections come from a blocking pool, so batch helpers can gather all
+    their chunks at once and simply wait for a free connection. Pass another
+    client's `connection_pool` to share one pool between clients.
+    """
+
+    def __init__(self, host='localhost', port=6379, db=0, batch_size=DEFAULT_BATCH_SIZE, max_connections=50,
+                 connection_pool=None, serializer='json'):
+        if connection_pool is None:
+            connection_pool = redis.asyncio.BlockingConnectionPool(host=host, port=port, db=db,
+                                                                   max_connections=max_connections,
+                                                                   decode_responses=True)
+        self.connection_pool = connection_pool
+        self.redis_conn = redis.asyncio.StrictRedis(connection_pool=connection_pool)
+        self.serializer = get_serializer(serializer) if isinstance(serializer, str) else serializer
+        self.batch_size = batch_size
+        self.set_dict_script = self.redis_conn.register_script(SET_DICT_SCRIPT)
+        self.get_dict_script = self.redis_conn.register_script(GET_DICT_SCRIPT)
+
+    async def close(self):
+        await self.connection_pool.disconnect()
+
+    async def _set_dict(self, key, value, expiry=None, client=None):
+        return await self.set_dict_script(keys=[key], args=set_dict_args(value, expiry), client=client)
+
+    async def _get_dict(self, key, client=None):
+        return await self.get_dict_script(keys=[key], client=client)
+
+    async def redis_set_value(self, key, value):
+        return await self.redis_conn.set(key, value)
+
+    async def redis_get_value(self, key):
+        return await self.redis_conn.get(key)
+
+    async def redis_set_dict_value(self, key, value):
+        if not isinstance(value, dict):
+            raise ValueError("Value must be a dictionary")
+        return (await self._set_dict(key, value))[0]
+
+    async def redis_get_dict_value(self, key):
+        value = dict_reply(await self._get_dict(key))
+        if value is None:
+            raise TypeError(f"Key '{key}' is not of type hash")
+        return value
+
+    async def redis_set_value_and_expiry(self, key, value, expiry):
+        return await self.redis_conn.setex(key, expiry, value)
+
+    async def redis_set_dict_value_and_expiry(self, key, value, expiry):
+        if not isinstance(value, dict):
+            raise ValueError("Value must be a dictionary")
+        added, expired = await self._set_dict(key, value, expiry)
+        return [added, bool(expired)]
+
+    async def redis_delete_value(self, key):
+        return await self.redis_conn.delete(key)
+
+    async def redis_set_object(self, key, value, expiry=None):
+        return await self.redis_conn.set(key, self.serializer.dumps(value), ex=expiry)
+
+    async def redis_get_object(self, key):
+        data = await self.redis_conn.execute_command('GET', key, **{NEVER_DECODE: True})
+        return None if data is None else self.serializer.loads(data)
+
+    # Batch operations, as in RedisClient, except that the chunks run
+    # concurrently on separate connections
+
+    async def _gather_chunks(self, items, run_chunk):
+        replies = await asyncio.gather(*(run_chunk(chunk) for chunk in chunked(items, self.batch_size)))
+        return [reply for chunk_replies in replies for reply in chunk_replies]
+
+    async def set_many(self, items, expiry=None):
+        async def run_chunk(chunk):
+            if expiry is None:
+                return [await self.redis_conn.mset(dict(chunk))] * len(chunk)
+            async with self.redis_conn.pipeline(transaction=False) as pipeline:
+                for key, value in chunk:
+                    pipeline.set(key, value, ex=expiry_for(key, expiry))
+                return await pipeline.execute()
+
+        return await self._gather_chunks(as_items(items), run_chunk)
+
+    async def get_many(self, keys):
+        return await self._gather_chunks(list(keys), self.redis_conn.mget)
+
+    async def set_dict_many(self, items, expiry=None):
+        items = as_items(items)
+        for _, value in items:
+            if not isinstance(value, dict):
+                raise ValueError("Value must be a dictionary")
+
+        async def run_chunk(chunk):
+            async with self.redis_conn.pipeline(transaction=False) as pipeline:
+                for key, value in chunk:
+                    await self._set_dict(key, value, expiry_for(key, expiry), client=pipeline)
+                return [reply[0] for reply in await pipeline.execute()]
+
+        return await self._gather_chunks(items, run_chunk)
+
+    async def get_dict_many(self, keys):
+        async def run_chunk(chunk):
+            async with self.redis_conn.pipeline(transaction=False) as pipeline:
+                for key in chunk:
+                    await self._get_dict(key, client=pipeline)
+                return [dict_reply(reply) for reply in await pipeline.execute()]
+
+        return await self._gather_chunks(list(keys), run_chunk)
+
+    async def delete_many(self, keys):
+        async def run_chunk(chunk):
+            return [await self.redis_conn.delete(*chunk)]
+
+        return sum(await self._gather_chunks(list(keys), run_chunk))
+
+    async def set_object_many(self, items, expiry=None):
+        async def run_chunk(chunk):
+            async with self.redis_conn.pipeline(transaction=False) as pipeline:
+                for key, value in chunk:
+                    pipeline.set(key, self.serializer.dumps(value), ex=expiry_for(key, expiry))
+                return await pipeline.execute()
+
+        return await self._gather_chunks(as_items(items), run_chunk)
+
+    async def get_object_many(self, keys):
+        async def run_chunk(chunk):
+            chunk_data = await self.redis_conn.execute_command('MGET', *chunk, **{NEVER_DECODE: True})
+            return [None if data is None else self.serializer.loads(data) for data in chunk_data]
+
+        return await self._gather_chunks(list(keys), run_chunk)
+
 
 def parse_dict_input(input_str):
     try:
@@ -45,9 +341,149 @@ def parse_dict_input(input_str):
     except ValueError:
         raise ValueError("Invalid dictionary format. Ensure you use key=value pairs separated by commas.")
 
-def main():
-    client = RedisClient()
 
+# Batch mode. Commands use the menu's operations; the Redis command names are
+# accepted as aliases so existing seed files can be replayed as they are.
+BATCH_OPS = ['set', 'get', 'set_dict', 'get_dict', 'set_expiry', 'set_dict_expiry', 'delete']
+OP_ALIASES = {'SET': 'set', 'GET': 'get', 'HSET': 'set_dict', 'HGETALL': 'get_dict', 'SETEX': 'set_expiry',
+              'DEL': 'delete'}
+
+
+def is_scalar(value):
+    # redis-py refuses bools (and anything nested) with DataError, which
+    # would fail the whole pipeline rather than just this command
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+def normalize_command(op, key, value=None, expiry=None):
+    op = OP_ALIASES.get(op, op)
+    if op not in BATCH_OPS:
+        raise ValueError(f"Unknown operation '{op}'. Use one of: {', '.join(BATCH_OPS)}")
+    if not isinstance(key, str) or not key:
+        raise ValueError("A non-empty key is required")
+    if op.endswith('_expiry'):
+        if expiry is None:
+            raise ValueError(f"'{op}' needs an expiry")
+        op = op[:-len('_expiry')]
+    if expiry is not None:
+        if isinstance(expiry, bool):
+            raise ValueError("Expiry must be a positive number of seconds")
+        expiry = int(expiry)
+        if expiry <= 0:
+            raise ValueError("Expiry must be a positive number of seconds")
+    if op == 'set' and not is_scalar(value):
+        raise ValueError("'set' needs a string or number value")
+    if op == 'set_dict' and not isinstance(value, dict):
+        raise ValueError("Value must be a dictionary")
+    if op == 'set_dict':
+        for field, field_value in value.items():
+            if not is_scalar(field_value):
+                raise ValueError(f"Field '{field}' needs a string or number value")
+    return {'op': op, 'key': key, 'value': value, 'expiry': expiry}
+
+
+def parse_command(line):
+    # JSON lines: {"op": "set_dict", "key": "k", "value": {...}, "expiry": 60}
+    # Plain lines: op key [expiry] [value], e.g. "set_dict_expiry k 60 a=1,b=2"
+    if line.startswith('{'):
+        command = json.loads(line)
+        return normalize_command(command.get('op'), command.get('key'), command.get('value'), command.get('expiry'))
+
+    op, _, rest = line.partition(' ')
+    op = OP_ALIASES.get(op, op)
+    if op in ('get', 'get_dict', 'delete'):
+        return normalize_command(op, rest.strip())
+    expiry = None
+    if op.endswith('_expiry'):
+        key, _, rest = rest.strip().partition(' ')
+        expiry, _, value = rest.strip().partition(' ')
+    else:
+        key, _, value = rest.strip().partition(' ')
+    if op in ('set_dict', 'set_dict_expiry'):
+        value = parse_dict_input(value)
+    return normalize_command(op, key, value, expiry)
+
+
+def read_commands(stream):
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            yield number, parse_command(line), None
+        except (ValueError, TypeError) as e:
+            yield number, None, str(e)
+
+
+def run_batch(client, commands, chunk_size):
+    # Each chunk of commands goes out in one pipeline. Failures are reported
+    # per command and do not stop the rest of the batch.
+    commands = iter(commands)
+    while True:
+        chunk = list(itertools.islice(commands, chunk_size))
+        if not chunk:
+            return
+        pipeline = client.redis_conn.pipeline(transaction=False)
+        queued = []
+        for number, command, error in chunk:
+            if error is not None:
+                continue
+            op, key, value, expiry = command['op'], command['key'], command['value'], command['expiry']
+            if op == 'set':
+                pipeline.set(key, value, ex=expiry)
+            elif op == 'get':
+                pipeline.get(key)
+            elif op == 'set_dict':
+                client._set_dict(key, value, expiry, client=pipeline)
+            elif op == 'get_dict':
+                client._get_dict(key, client=pipeline)
+            else:
+                pipeline.delete(key)
+            queued.append(number)
+        replies = dict(zip(queued, pipeline.execute(raise_on_error=False))) if queued else {}
+
+        for number, command, error in chunk:
+            result = replies.get(number)
+            if error is None and isinstance(result, Exception):
+                error, result = str(result), None
+            elif error is None and command['op'] == 'set_dict':
+                result = result[0] if command['expiry'] is None else [result[0], bool(result[1])]
+            elif error is None and command['op'] == 'get_dict':
+                result = dict_reply(result)
+                if result is None:
+                    error = f"Key '{command['key']}' is not of type hash"
+            yield number, command, result, error
+
+
+def batch_main(client, options):
+    stream = sys.stdin if options.batch == '-' else open(options.batch, encoding='utf-8')
+    total = errors = 0
+    start = time.perf_counter()
+    try:
+        for number, command, result, error in run_batch(client, read_commands(stream), options.chunk_size):
+            total += 1
+            if error is not None:
+                errors += 1
+            if not options.quiet or error is not None:
+                line = {'line': number, 'op': command and command['op'], 'key': command and command['key']}
+                line.update({'error': error} if error is not None else {'result': result})
+                print(json.dumps(line))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    elapsed = time.perf_counter() - start
+    sys.stdout.flush()
+    print(json.dumps({
+        'commands': total,
+        'errors': errors,
+        'elapsed_sec': round(elapsed, 4),
+        'commands_per_sec': round(total / elapsed, 1) if elapsed else 0.0,
+        'chunk_size': options.chunk_size,
+    }), file=sys.stderr)
+    return 1 if errors else 0
+
+
+def interactive_menu(client):
     while True:
         print("\nRedis CLI Menu:")
         print("1. Set string value")
@@ -113,5 +549,22 @@ def main():
         else:
             print("Invalid choice. Please select a valid option.")
 
+def main():
+    parser = argparse.ArgumentParser(description="Redis CLI. Runs the interactive menu unless --batch is given.")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="Run commands from FILE ('-' for stdin), one per line or as JSON lines")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_BATCH_SIZE, help="Commands per pipeline")
+    parser.add_argument('--quiet', action='store_true', help="Only print failed commands and the summary")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=6379)
+    parser.add_argument('--db', type=int, default=0)
+    options = parser.parse_args()
+
+    client = RedisClient(host=options.host, port=options.port, db=options.db, batch_size=options.chunk_size)
+    if options.batch:
+        sys.exit(batch_main(client, options))
+    interactive_menu(client)
+
+
 if __name__ == "__main__":
     main()
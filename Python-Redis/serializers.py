@@ -0,0 +1,98 @@
+import json
+import zlib
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+DEFAULT_COMPRESS_THRESHOLD = 1024
+
+# First byte of every compressed-serializer payload
+RAW = b'\x00'
+ZLIB = b'z'
+LZ4 = b'l'
+
+
+class JsonSerializer:
+    name = 'json'
+
+    def dumps(self, value):
+        return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class MsgpackSerializer:
+    name = 'msgpack'
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed (pip install msgpack)")
+
+    def dumps(self, value):
+        return msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, data):
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+class CompressedSerializer:
+    """Compresses another serializer's output once it reaches `threshold` bytes.
+
+    Small payloads are stored as-is behind a one-byte marker, since compressing
+    them costs CPU and usually makes them bigger.
+    """
+
+    def __init__(self, serializer, algorithm='zlib', threshold=DEFAULT_COMPRESS_THRESHOLD, level=None):
+        if algorithm == 'lz4' and lz4 is None:
+            raise RuntimeError("lz4 is not installed (pip install lz4)")
+        if algorithm not in ('zlib', 'lz4'):
+            raise ValueError(f"Unknown compression algorithm: {algorithm}")
+        self.serializer = serializer
+        self.algorithm = algorithm
+        self.threshold = threshold
+        self.level = level
+        self.name = f"{serializer.name}+{algorithm}"
+
+    def dumps(self, value):
+        data = self.serializer.dumps(value)
+        if len(data) < self.threshold:
+            return RAW + data
+        if self.algorithm == 'lz4':
+            return LZ4 + lz4.frame.compress(data, compression_level=self.level or 0)
+        return ZLIB + zlib.compress(data, 6 if self.level is None else self.level)
+
+    def loads(self, data):
+        marker, payload = data[:1], data[1:]
+        if marker == ZLIB:
+            payload = zlib.decompress(payload)
+        elif marker == LZ4:
+            if lz4 is None:
+                raise RuntimeError("lz4 is not installed (pip install lz4)")
+            payload = lz4.frame.decompress(payload)
+        elif marker != RAW:
+            raise ValueError("Payload was not written by a compressed serializer")
+        return self.serializer.loads(payload)
+
+
+SERIALIZER_NAMES = ['json', 'msgpack', 'json+zlib', 'json+lz4', 'msgpack+zlib', 'msgpack+lz4']
+
+
+def get_serializer(name, threshold=DEFAULT_COMPRESS_THRESHOLD):
+    base, _, algorithm = name.partition('+')
+    if base == 'json':
+        serializer = JsonSerializer()
+    elif base == 'msgpack':
+        serializer = MsgpackSerializer()
+    else:
+        raise ValueError(f"Unknown serializer: {name}. Choose from: {', '.join(SERIALIZER_NAMES)}")
+    if algorithm:
+        serializer = CompressedSerializer(serializer, algorithm, threshold)
+    return serializer
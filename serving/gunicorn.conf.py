@@ -0,0 +1,47 @@
+# Gunicorn settings shared by the Flask apps in this repository.
+#
+#   gunicorn -c ../serving/gunicorn.conf.py 'app-v2:app'
+#
+# Every value can be overridden through the environment so the same file works
+# on a laptop and on a large host. Send SIGHUP to the master for a graceful
+# reload (new workers start before the old ones finish their requests).
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# gthread keeps a pool of threads per worker, which suits these apps since
+# they mostly wait on MongoDB and Redis. Set GUNICORN_WORKER_CLASS=gevent to
+# use green threads instead (requires the gevent package).
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = _env_int('WEB_CONCURRENCY', cpu_count * 2 + 1)
+threads = _env_int('GUNICORN_THREADS', 4)
+worker_connections = _env_int('GUNICORN_WORKER_CONNECTIONS', 1000)
+
+# Keep idle client connections open briefly so load balancers and clients can
+# reuse them instead of reconnecting for every request.
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+
+# Recycling workers periodically bounds memory growth, but a recycled worker
+# takes the passenger API's background upload jobs down with it, so it is
+# opt-in: set GUNICORN_MAX_REQUESTS for apps without them. The jitter stops
+# all workers restarting at the same moment.
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 0)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0') == '1'
+reload = os.environ.get('GUNICORN_RELOAD', '0') == '1'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
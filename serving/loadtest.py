@@ -0,0 +1,168 @@
+"""Small HTTP load generator for comparing serving modes.
+
+Measure an already running server:
+
+    python serving/loadtest.py --url http://localhost:5000/ --concurrency 32 --duration 10
+
+Or start an app under the Flask dev server and under gunicorn in turn and
+compare both on the same endpoints:
+
+    python serving/loadtest.py --compare --app Chat-Bot-Docker/v1/app.py --path / --path /pool_stats
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+SERVING_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(urls, concurrency, duration, method='GET', body=None):
+    deadline = time.perf_counter() + duration
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    headers = {'Content-Type': 'application/json'} if body else {}
+
+    def worker(offset):
+        local_latencies = []
+        local_errors = 0
+        conn = None
+        i = offset
+        while time.perf_counter() < deadline:
+            parts = urlsplit(urls[i % len(urls)])
+            i += 1
+            path = parts.path + (f"?{parts.query}" if parts.query else '')
+            reused = conn is not None
+            if conn is None:
+                conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+            start = time.perf_counter()
+            try:
+                conn.request(method, path or '/', body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 500:
+                    local_errors += 1
+                if response.getheader('Connection', '').lower() == 'close':
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                # A kept-alive connection the server has since closed (idle
+                # timeout, worker restart) is retried on a fresh connection
+                conn.close()
+                conn = None
+                if not reused:
+                    local_errors += 1
+                i -= 1
+                continue
+            local_latencies.append(time.perf_counter() - start)
+        if conn is not None:
+            conn.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round((latencies[-1] if latencies else 0) * 1000, 2),
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start within {timeout}s")
+
+
+def server_commands(app_path, port):
+    app_dir = os.path.dirname(os.path.abspath(app_path))
+    module = os.path.splitext(os.path.basename(app_path))[0]
+    dev = [sys.executable, '-m', 'flask', '--app', module, 'run', '--port', str(port)]
+    gunicorn = [
+        sys.executable, '-m', 'gunicorn', '-c', os.path.join(SERVING_DIR, 'gunicorn.conf.py'),
+        '--bind', f'127.0.0.1:{port}', '--access-logfile', '/dev/null', f'{module}:app',
+    ]
+    return app_dir, {"flask dev server": dev, "gunicorn": gunicorn}
+
+
+def compare(args):
+    results = {}
+    for name in ("flask dev server", "gunicorn"):
+        port = free_port()
+        app_dir, commands = server_commands(args.app, port)
+        process = subprocess.Popen(commands[name], cwd=app_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(port)
+            urls = [f"http://127.0.0.1:{port}{path}" for path in args.path]
+            run_load(urls, args.concurrency, min(2, args.duration), args.method, args.body)  # warm up
+            results[name] = run_load(urls, args.concurrency, args.duration, args.method, args.body)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP load test for the Flask apps")
+    parser.add_argument('--url', action='append', default=[], help="URL to load (repeatable)")
+    parser.add_argument('--compare', action='store_true', help="Compare the Flask dev server with gunicorn")
+    parser.add_argument('--app', help="Path to the Flask app file when using --compare")
+    parser.add_argument('--path', action='append', default=[], help="Request path when using --compare (repeatable)")
+    parser.add_argument('--method', default='GET')
+    parser.add_argument('--body', help="JSON request body")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    if args.compare:
+        if not args.app:
+            parser.error("--compare requires --app")
+        args.path = args.path or ['/']
+        results = compare(args)
+    else:
+        if not args.url:
+            parser.error("Provide --url or --compare")
+        results = {"target": run_load(args.url, args.concurrency, args.duration, args.method, args.body)}
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()